@@ -0,0 +1,24 @@
+"""Shared test configuration."""
+
+from __future__ import annotations
+
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+# vmt.vm imports libvirt at module level, but every test mocks the
+# connection.  Install a stand-in before collection so the libvirt C
+# extension is never loaded (and isn't required to run the suite).
+# libvirtError stays a real exception class so ``except`` clauses work.
+_libvirt = MagicMock(name="libvirt")
+_libvirt.libvirtError = type("libvirtError", (Exception,), {})
+sys.modules.setdefault("libvirt", _libvirt)
+
+
+@pytest.fixture(autouse=True)
+def manifest_cache_dir(tmp_path_factory, monkeypatch):
+    """Point the on-disk manifest cache at a fresh temp dir for each test."""
+    cache_dir = tmp_path_factory.mktemp("manifest-cache")
+    monkeypatch.setattr("vmt.manifest._CACHE_DIR", cache_dir)
+    return cache_dir
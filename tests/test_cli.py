@@ -1,10 +1,26 @@
-"""Tests for vmt.cli — argument parsing for all subcommands."""
+"""Tests for vmt.cli — argument parsing and dispatch for all subcommands."""
 
 from __future__ import annotations
 
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
 import pytest
 
-from vmt.cli import build_parser
+import vmt.connect as connect_mod
+from vmt.cli import (
+    _requested_command,
+    _run_commands,
+    build_parser,
+    cmd_test,
+    main,
+)
+from vmt.screenshot import compare_screenshots_batch
 
 
 # ---------------------------------------------------------------------------
@@ -17,29 +33,35 @@ def parser():
 
 
 # ---------------------------------------------------------------------------
-# up
+# Name-only and snapshot subcommands
 # ---------------------------------------------------------------------------
 
-class TestUpCommand:
-    """Tests for 'vmt up <name>'."""
-
-    def test_parses_name(self, parser):
-        args = parser.parse_args(["up", "arch-sway"])
-        assert args.command == "up"
-        assert args.name == "arch-sway"
-
-
-# ---------------------------------------------------------------------------
-# destroy
-# ---------------------------------------------------------------------------
-
-class TestDestroyCommand:
-    """Tests for 'vmt destroy <name>'."""
-
-    def test_parses_name(self, parser):
-        args = parser.parse_args(["destroy", "arch-sway"])
-        assert args.command == "destroy"
-        assert args.name == "arch-sway"
+@pytest.mark.parametrize(
+    ("argv", "expected"),
+    [
+        (["up", "arch-sway"], {"command": "up", "name": "arch-sway"}),
+        (["destroy", "arch-sway"], {"command": "destroy", "name": "arch-sway"}),
+        (["view", "arch-sway"], {"command": "view", "name": "arch-sway"}),
+        (
+            ["update-references", "arch-sway"],
+            {"command": "update-references", "name": "arch-sway"},
+        ),
+        (
+            ["snapshot", "arch-sway", "clean-boot"],
+            {"command": "snapshot", "name": "arch-sway", "snap_name": "clean-boot"},
+        ),
+        (
+            ["restore", "arch-sway", "clean-boot"],
+            {"command": "restore", "name": "arch-sway", "snap_name": "clean-boot"},
+        ),
+    ],
+    ids=lambda v: v[0] if isinstance(v, list) else None,
+)
+def test_simple_subcommands(parser, argv, expected):
+    """'vmt <cmd> <name> [snap_name]' parses into the expected namespace."""
+    args = parser.parse_args(argv)
+    for key, value in expected.items():
+        assert getattr(args, key) == value
 
 
 # ---------------------------------------------------------------------------
@@ -62,19 +84,6 @@ class TestSshCommand:
         assert args.cmd == ["ls", "-la"]
 
 
-# ---------------------------------------------------------------------------
-# view
-# ---------------------------------------------------------------------------
-
-class TestViewCommand:
-    """Tests for 'vmt view <name>'."""
-
-    def test_parses_name(self, parser):
-        args = parser.parse_args(["view", "arch-sway"])
-        assert args.command == "view"
-        assert args.name == "arch-sway"
-
-
 # ---------------------------------------------------------------------------
 # screenshot
 # ---------------------------------------------------------------------------
@@ -109,61 +118,319 @@ class TestTestCommand:
 
 
 # ---------------------------------------------------------------------------
-# snapshot
+# Global flags
 # ---------------------------------------------------------------------------
 
-class TestSnapshotCommand:
-    """Tests for 'vmt snapshot <name> <snap_name>'."""
+class TestGlobalFlags:
+    """Tests for global flags like -v/--verbose."""
 
-    def test_parses_name_and_snap_name(self, parser):
-        args = parser.parse_args(["snapshot", "arch-sway", "clean-boot"])
-        assert args.command == "snapshot"
-        assert args.name == "arch-sway"
-        assert args.snap_name == "clean-boot"
+    def test_verbose_flag(self, parser):
+        args = parser.parse_args(["-v", "up", "arch-sway"])
+        assert args.verbose is True
+
+    def test_verbose_long_flag(self, parser):
+        args = parser.parse_args(["--verbose", "up", "arch-sway"])
+        assert args.verbose is True
+
+    def test_no_verbose_by_default(self, parser):
+        args = parser.parse_args(["up", "arch-sway"])
+        assert args.verbose is False
 
 
 # ---------------------------------------------------------------------------
-# restore
+# Lazy subparser registration
 # ---------------------------------------------------------------------------
 
-class TestRestoreCommand:
-    """Tests for 'vmt restore <name> <snap_name>'."""
-
-    def test_parses_name_and_snap_name(self, parser):
-        args = parser.parse_args(["restore", "arch-sway", "clean-boot"])
-        assert args.command == "restore"
-        assert args.name == "arch-sway"
+class TestLazySubparsers:
+    """Tests for building only the requested subcommand's parser."""
+
+    @pytest.mark.parametrize(
+        ("argv", "expected"),
+        [
+            (["up", "arch-sway"], "up"),
+            (["-v", "ssh", "arch-sway", "--", "ls"], "ssh"),
+            (["--", "up"], None),
+            (["bogus"], None),
+            (["--help"], None),
+            (["--help", "up"], None),
+            (["-v", "-h", "test"], None),
+            (["up", "--help"], "up"),
+            ([], None),
+        ],
+    )
+    def test_requested_command(self, argv, expected):
+        assert _requested_command(argv) == expected
+
+    def test_only_requested_subparser_built(self):
+        parser = build_parser("snapshot")
+        args = parser.parse_args(["snapshot", "arch-sway", "clean-boot"])
         assert args.snap_name == "clean-boot"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["up", "arch-sway"])
+
+    def test_unknown_command_builds_all(self):
+        args = build_parser("bogus").parse_args(["up", "arch-sway"])
+        assert args.command == "up"
+
+    def test_top_level_help_before_command_lists_all(self, capsys):
+        with pytest.raises(SystemExit):
+            main(["--help", "up"])
+        out = capsys.readouterr().out
+        for name in ("up", "test", "snapshot", "ssh"):
+            assert name in out
+        assert "{up}" not in out
+
+    def test_parsers_are_cached(self):
+        assert build_parser() is build_parser()
+        assert build_parser("bogus") is build_parser()
+        assert build_parser("up") is build_parser("up")
+        assert build_parser("up") is not build_parser()
 
 
 # ---------------------------------------------------------------------------
-# update-references
+# Dispatch
 # ---------------------------------------------------------------------------
 
-class TestUpdateReferencesCommand:
-    """Tests for 'vmt update-references <name>'."""
+class TestDispatch:
+    """Tests for main() routing parsed arguments to the cmd_* functions."""
 
-    def test_parses_name(self, parser):
-        args = parser.parse_args(["update-references", "arch-sway"])
-        assert args.command == "update-references"
-        assert args.name == "arch-sway"
+    def test_routes_snapshot(self):
+        with patch("vmt.cli.cmd_snapshot") as mock_cmd:
+            main(["snapshot", "arch-sway", "clean-boot"])
+        mock_cmd.assert_called_once_with("arch-sway", "clean-boot")
+
+    def test_routes_screenshot_with_path(self):
+        with patch("vmt.cli.cmd_screenshot") as mock_cmd:
+            main(["screenshot", "arch-sway", "/tmp/shot.png", "./out.png"])
+        mock_cmd.assert_called_once_with(
+            "arch-sway", "/tmp/shot.png", Path("./out.png")
+        )
+
+    def test_no_command_prints_help(self, capsys):
+        with pytest.raises(SystemExit):
+            main([])
+        assert "usage: vmt" in capsys.readouterr().out
 
 
 # ---------------------------------------------------------------------------
-# Global flags
+# Remote command batching
 # ---------------------------------------------------------------------------
 
-class TestGlobalFlags:
-    """Tests for global flags like -v/--verbose."""
+class _LocalShell:
+    """Stands in for SSHClient by running scripts with the local shell."""
 
-    def test_verbose_flag(self, parser):
-        args = parser.parse_args(["-v", "up", "arch-sway"])
-        assert args.verbose is True
+    def __init__(self):
+        self.scripts = []
 
-    def test_verbose_long_flag(self, parser):
-        args = parser.parse_args(["--verbose", "up", "arch-sway"])
-        assert args.verbose is True
+    def run(self, command):
+        self.scripts.append(command)
+        proc = subprocess.run(
+            ["sh", "-c", command], capture_output=True, text=True
+        )
+        return SimpleNamespace(stdout=proc.stdout, returncode=proc.returncode)
 
-    def test_no_verbose_by_default(self, parser):
-        args = parser.parse_args(["up", "arch-sway"])
-        assert args.verbose is False
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash not installed")
+class TestRunCommands:
+    def test_one_exec_per_batch(self):
+        shell = _LocalShell()
+        assert _run_commands(shell, ["echo one", "echo two"]) == ["one\n", "two\n"]
+        assert len(shell.scripts) == 1
+
+    def test_empty_batch_skips_exec(self):
+        shell = _LocalShell()
+        assert _run_commands(shell, []) == []
+        assert shell.scripts == []
+
+    def test_commands_are_isolated(self):
+        outputs = _run_commands(
+            _LocalShell(), ["cd / && export X=1 && false", "echo ${X:-unset}", "cat"]
+        )
+        assert outputs == ["", "unset\n", ""]
+
+    def test_heredoc_delimiter_in_command(self):
+        outputs = _run_commands(
+            _LocalShell(), ["cat <<'VMT_EOF'\nhi\nVMT_EOF", "echo after"]
+        )
+        assert outputs == ["hi\n", "after\n"]
+
+    def test_short_output_is_padded(self):
+        shell = SimpleNamespace(run=lambda _cmd: SimpleNamespace(stdout=""))
+        assert _run_commands(shell, ["a", "b"]) == ["", ""]
+
+
+# ---------------------------------------------------------------------------
+# cmd_test
+# ---------------------------------------------------------------------------
+
+class TestCmdTest:
+    @pytest.fixture
+    def ssh_clients(self):
+        """Patch the manager and SSHClient; yield the SSHClient mock class."""
+        mgr = MagicMock()
+        mgr.get_info.return_value = {"ip": "10.0.0.5", "ssh_user": "arch"}
+        with (
+            patch("vmt.cli._get_manager", return_value=mgr),
+            patch("vmt.cli.SSHClient") as MockSSHClient,
+            patch(
+                "vmt.cli._run_commands",
+                side_effect=lambda _client, cmds: [f"{c}\n" for c in cmds],
+            ),
+        ):
+            yield MockSSHClient
+
+    @staticmethod
+    def _write_manifest(tmp_path: Path, parallel: bool) -> Path:
+        path = tmp_path / "vmt-test.toml"
+        path.write_text(
+            f"[test]\nvm = \"arch-sway\"\nparallel = {str(parallel).lower()}\n"
+            + "".join(
+                f'[[scenario]]\nname = "s{i}"\ncommands = ["echo s{i}"]\n'
+                f'expect_output = "s{i}"\n'
+                for i in range(3)
+            )
+        )
+        return path
+
+    def test_serial_shares_one_client(self, ssh_clients, tmp_path, capsys):
+        cmd_test("arch-sway", self._write_manifest(tmp_path, parallel=False))
+        ssh_clients.assert_called_once_with(host="10.0.0.5", user="arch", port=22)
+        assert "All 3 scenario(s) passed" in capsys.readouterr().out
+
+    def test_parallel_keeps_output_in_order(self, ssh_clients, tmp_path, capsys):
+        cmd_test("arch-sway", self._write_manifest(tmp_path, parallel=True))
+        out = capsys.readouterr().out
+        assert ssh_clients.call_count == 3
+        positions = [out.index(f"--- Scenario: s{i} ---") for i in range(3)]
+        assert positions == sorted(positions)
+        assert "All 3 scenario(s) passed" in out
+
+    def test_parallel_workers_capped(self, ssh_clients, tmp_path):
+        path = tmp_path / "vmt-test.toml"
+        path.write_text(
+            '[test]\nvm = "arch-sway"\nparallel = true\n'
+            + "".join(f'[[scenario]]\nname = "s{i}"\n' for i in range(10))
+        )
+        with patch(
+            "vmt.cli.ThreadPoolExecutor", wraps=ThreadPoolExecutor
+        ) as executor:
+            cmd_test("arch-sway", path)
+        assert executor.call_args.kwargs["max_workers"] == 4
+
+    def test_parallel_scenarios_share_one_pooled_transport(self, tmp_path):
+        def slow_client():
+            client = MagicMock()
+            client.connect.side_effect = lambda **kw: time.sleep(0.02)
+            return client
+
+        def run_commands(client, commands):
+            client._ensure_connected()
+            return [f"{c}\n" for c in commands]
+
+        mgr = MagicMock()
+        mgr.get_info.return_value = {"ip": "10.0.0.5", "ssh_user": "arch"}
+        path = self._write_manifest(tmp_path, parallel=True)
+        connect_mod.close_pool()
+        try:
+            with (
+                patch("vmt.cli._get_manager", return_value=mgr),
+                patch("vmt.cli._run_commands", side_effect=run_commands),
+                patch("vmt.connect.get_ssh_key_path", return_value=Path("/k")),
+                patch(
+                    "vmt.connect.paramiko.SSHClient", side_effect=slow_client
+                ) as transports,
+            ):
+                cmd_test("arch-sway", path)
+                assert transports.call_count == len(connect_mod._POOL) == 1
+        finally:
+            connect_mod.close_pool()
+
+    def test_failures_exit_nonzero(self, ssh_clients, tmp_path, capsys):
+        path = self._write_manifest(tmp_path, parallel=True)
+        path.write_text(
+            path.read_text().replace('expect_output = "s1"', 'expect_output = "nope"')
+        )
+        with pytest.raises(SystemExit) as exc_info:
+            cmd_test("arch-sway", path)
+        assert exc_info.value.code == 1
+        assert "1 scenario(s) failed" in capsys.readouterr().out
+
+    def test_serial_downloads_before_next_scenario(self, ssh_clients, tmp_path):
+        path = tmp_path / "vmt-test.toml"
+        path.write_text(
+            '[test]\nvm = "arch-sway"\n'
+            '[[scenario]]\nname = "a"\ncommands = ["one"]\n'
+            'screenshot = "/tmp/a.png"\n'
+            '[[scenario]]\nname = "b"\ncommands = ["two"]\n'
+            'screenshot = "/tmp/b.png"\n'
+        )
+        events = []
+        client = ssh_clients.return_value
+        client.download.side_effect = lambda remote, local: events.append(remote)
+        with patch(
+            "vmt.cli._run_commands",
+            side_effect=lambda _client, cmds: events.extend(cmds) or cmds,
+        ):
+            cmd_test("arch-sway", path)
+
+        assert events == ["one", "/tmp/a.png", "two", "/tmp/b.png"]
+
+    def test_duplicate_names_get_distinct_local_paths(self, ssh_clients, tmp_path):
+        path = tmp_path / "vmt-test.toml"
+        path.write_text(
+            '[test]\nvm = "arch-sway"\n'
+            '[[scenario]]\nname = "same"\nscreenshot = "/tmp/a.png"\n'
+            '[[scenario]]\nname = "same"\nscreenshot = "/tmp/a.png"\n'
+        )
+        cmd_test("arch-sway", path)
+
+        locals_ = [
+            c.args[1] for c in ssh_clients.return_value.download.call_args_list
+        ]
+        assert len(locals_) == 2
+        assert locals_[0] != locals_[1]
+
+    @staticmethod
+    def _write_screenshot_manifest(tmp_path: Path, parallel: bool) -> Path:
+        (tmp_path / "ref.png").touch()
+        path = tmp_path / "vmt-test.toml"
+        path.write_text(
+            f'[test]\nvm = "arch-sway"\nparallel = {str(parallel).lower()}\n'
+            + "".join(
+                f'[[scenario]]\nname = "s{i}"\nscreenshot = "/tmp/{i}.png"\n'
+                'reference = "ref.png"\n'
+                for i in range(4)
+            )
+        )
+        return path
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_compares_as_one_batch_in_manifest_order(
+        self, ssh_clients, tmp_path, capsys, parallel
+    ):
+        path = self._write_screenshot_manifest(tmp_path, parallel)
+
+        def fake_compare(actual, reference, threshold):
+            score = 0.5 if actual.name == "01-s1.png" else 0.99
+            return score >= threshold, score
+
+        with (
+            patch(
+                "vmt.cli.compare_screenshots_batch",
+                wraps=compare_screenshots_batch,
+            ) as batch,
+            patch("vmt.screenshot.compare_screenshots", side_effect=fake_compare),
+            patch("vmt.cli.generate_diff_image") as diff,
+            pytest.raises(SystemExit),
+        ):
+            cmd_test("arch-sway", path)
+
+        batch.assert_called_once()
+        assert len(batch.call_args.args[0]) == 4
+        diff.assert_called_once()
+        out = capsys.readouterr().out
+        saved = [out.index(f"screenshots/{i:02d}-s{i}.png") for i in range(4)]
+        assert saved == sorted(saved)
+        scenario_1 = out.index("--- Scenario: s1 ---")
+        assert out.index("[s1] SSIM 0.5000") > scenario_1
+        assert "1 scenario(s) failed" in out
@@ -2,62 +2,104 @@
 
 from __future__ import annotations
 
+import socket
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch, PropertyMock
 
 import pytest
 
-from vmt.connect import RunResult, SSHClient, get_ssh_key_path, get_ssh_pubkey
+from vmt.connect import (
+    RunResult,
+    SSHClient,
+    _port_open,
+    clear_key_cache,
+    close_pool,
+    get_ssh_key_path,
+    get_ssh_pubkey,
+)
 
 
-# ── get_ssh_key_path ──────────────────────────────────────────────────
+# ── fixtures ──────────────────────────────────────────────────────────
 
 
-class TestGetSSHKeyPath:
-    """Tests for get_ssh_key_path()."""
+@pytest.fixture
+def ssh_dir(fs, monkeypatch):
+    """An empty ~/.ssh on an in-memory filesystem, with $VMT_HOME pointed at it."""
+    home = Path("/home/tester")
+    fs.create_dir(home / ".ssh")
+    clear_key_cache()
+    monkeypatch.setenv("VMT_HOME", str(home))
+    return home / ".ssh"
 
-    def test_finds_ed25519_first(self, tmp_path: Path):
-        """ed25519 is preferred over rsa and ecdsa."""
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
-        (ssh_dir / "id_ed25519").touch()
-        (ssh_dir / "id_rsa").touch()
 
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            result = get_ssh_key_path()
+@pytest.fixture
+def make_keys(ssh_dir: Path):
+    """Factory that creates empty key files in ssh_dir and returns ssh_dir."""
 
-        assert result == ssh_dir / "id_ed25519"
+    def _make(*names: str) -> Path:
+        for name in names:
+            (ssh_dir / name).touch()
+        return ssh_dir
 
-    def test_falls_back_to_rsa(self, tmp_path: Path):
-        """Falls back to rsa when ed25519 is absent."""
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
-        (ssh_dir / "id_rsa").touch()
+    return _make
 
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            result = get_ssh_key_path()
 
-        assert result == ssh_dir / "id_rsa"
+@pytest.fixture
+def mock_ssh():
+    """The paramiko.SSHClient instance SSHClient will create, mocked."""
+    close_pool()
+    with patch("vmt.connect.paramiko.SSHClient") as MockSSHClient:
+        yield MockSSHClient.return_value
+        close_pool()
 
-    def test_falls_back_to_ecdsa(self, tmp_path: Path):
-        """Falls back to ecdsa when ed25519 and rsa are absent."""
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
-        (ssh_dir / "id_ecdsa").touch()
 
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            result = get_ssh_key_path()
+# ── get_ssh_key_path ──────────────────────────────────────────────────
 
-        assert result == ssh_dir / "id_ecdsa"
 
-    def test_raises_when_no_key(self, tmp_path: Path):
+class TestGetSSHKeyPath:
+    """Tests for get_ssh_key_path()."""
+
+    def test_finds_ed25519_first(self, make_keys):
+        """ed25519 is preferred over rsa and ecdsa."""
+        ssh_dir = make_keys("id_ed25519", "id_rsa")
+        assert get_ssh_key_path() == ssh_dir / "id_ed25519"
+
+    def test_falls_back_to_rsa(self, make_keys):
+        """Falls back to rsa when ed25519 is absent."""
+        ssh_dir = make_keys("id_rsa")
+        assert get_ssh_key_path() == ssh_dir / "id_rsa"
+
+    def test_falls_back_to_ecdsa(self, make_keys):
+        """Falls back to ecdsa when ed25519 and rsa are absent."""
+        ssh_dir = make_keys("id_ecdsa")
+        assert get_ssh_key_path() == ssh_dir / "id_ecdsa"
+
+    def test_raises_when_no_key(self, ssh_dir):
         """Raises FileNotFoundError when no key exists."""
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
+        with pytest.raises(FileNotFoundError):
+            get_ssh_key_path()
+
+    def test_falls_back_to_path_home(self, make_keys, monkeypatch):
+        """Without $VMT_HOME, keys are looked up under Path.home()."""
+        ssh_dir = make_keys("id_rsa")
+        monkeypatch.delenv("VMT_HOME")
+        monkeypatch.setattr("vmt.connect.Path.home", lambda: ssh_dir.parent)
+        assert get_ssh_key_path() == ssh_dir / "id_rsa"
+
+    def test_result_is_cached(self, make_keys):
+        """A second lookup doesn't rescan ~/.ssh."""
+        ssh_dir = make_keys("id_rsa")
+        get_ssh_key_path()
+        (ssh_dir / "id_ed25519").touch()
+        assert get_ssh_key_path() == ssh_dir / "id_rsa"
 
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            with pytest.raises(FileNotFoundError):
-                get_ssh_key_path()
+    def test_clear_key_cache_rescans(self, make_keys):
+        ssh_dir = make_keys("id_rsa")
+        get_ssh_key_path()
+        (ssh_dir / "id_ed25519").touch()
+        clear_key_cache()
+        assert get_ssh_key_path() == ssh_dir / "id_ed25519"
 
 
 # ── get_ssh_pubkey ────────────────────────────────────────────────────
@@ -66,28 +108,17 @@ class TestGetSSHKeyPath:
 class TestGetSSHPubkey:
     """Tests for get_ssh_pubkey()."""
 
-    def test_reads_pub_file(self, tmp_path: Path):
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
-        (ssh_dir / "id_ed25519").touch()
+    def test_reads_pub_file(self, make_keys):
+        ssh_dir = make_keys("id_ed25519")
         (ssh_dir / "id_ed25519.pub").write_text(
             "ssh-ed25519 AAAA... user@host\n"
         )
+        assert get_ssh_pubkey() == "ssh-ed25519 AAAA... user@host"
 
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            result = get_ssh_pubkey()
-
-        assert result == "ssh-ed25519 AAAA... user@host"
-
-    def test_raises_when_pub_missing(self, tmp_path: Path):
-        ssh_dir = tmp_path / ".ssh"
-        ssh_dir.mkdir()
-        (ssh_dir / "id_ed25519").touch()
-        # no .pub file
-
-        with patch("vmt.connect.Path.home", return_value=tmp_path):
-            with pytest.raises(FileNotFoundError):
-                get_ssh_pubkey()
+    def test_raises_when_pub_missing(self, make_keys):
+        make_keys("id_ed25519")  # no .pub file
+        with pytest.raises(FileNotFoundError):
+            get_ssh_pubkey()
 
 
 # ── SSHClient ─────────────────────────────────────────────────────────
@@ -125,22 +156,27 @@ class TestSSHClientRun:
         )
 
     @staticmethod
-    def _mock_exec(stdout_data: str, stderr_data: str, rc: int):
-        """Build the three-tuple that paramiko exec_command returns."""
-        mock_stdin = MagicMock()
-
-        mock_stdout = MagicMock()
-        mock_stdout.read.return_value = stdout_data.encode()
-        mock_stdout.channel.recv_exit_status.return_value = rc
-
-        mock_stderr = MagicMock()
-        mock_stderr.read.return_value = stderr_data.encode()
-
-        return mock_stdin, mock_stdout, mock_stderr
+    def _mock_exec(stdout_data: str | list[bytes], stderr_data: str, rc: int):
+        """Build the three-tuple that paramiko exec_command returns.
+
+        Plain namespaces are enough: run() only touches stdout.channel
+        and stderr.read().  *stdout_data* may be a list of raw chunks to
+        hand out one recv() at a time.
+        """
+        if isinstance(stdout_data, str):
+            stdout_data = [stdout_data.encode()]
+        chunks = iter(stdout_data)
+        channel = SimpleNamespace(
+            recv=lambda _n: next(chunks, b""),
+            recv_exit_status=lambda: rc,
+            exit_status_ready=lambda: False,
+            close=MagicMock(),
+        )
+        stdout = SimpleNamespace(channel=channel)
+        stderr = SimpleNamespace(read=lambda: stderr_data.encode())
+        return SimpleNamespace(), stdout, stderr
 
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_run_returns_run_result(self, MockSSHClient):
-        mock_ssh = MockSSHClient.return_value
+    def test_run_returns_run_result(self, mock_ssh):
         mock_ssh.exec_command.return_value = self._mock_exec("hello\n", "", 0)
 
         client = self._make_client()
@@ -151,9 +187,7 @@ class TestSSHClientRun:
         assert result.stderr == ""
         assert result.returncode == 0
 
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_run_captures_stderr(self, MockSSHClient):
-        mock_ssh = MockSSHClient.return_value
+    def test_run_captures_stderr(self, mock_ssh):
         mock_ssh.exec_command.return_value = self._mock_exec("", "err\n", 1)
 
         client = self._make_client()
@@ -162,13 +196,39 @@ class TestSSHClientRun:
         assert result.stderr == "err\n"
         assert result.returncode == 1
 
+    def test_decodes_across_chunk_boundaries(self, mock_ssh):
+        data = "héllo\n".encode()
+        mock_ssh.exec_command.return_value = self._mock_exec(
+            [data[:2], data[2:]], "", 0
+        )
+
+        assert self._make_client().run("echo").stdout == "héllo\n"
+
+    def test_expect_stops_reading_early(self, mock_ssh):
+        exec_result = self._mock_exec(
+            [b"boot", b"ing\nrea", b"dy\n", b"more\n"], "", 0
+        )
+        mock_ssh.exec_command.return_value = exec_result
+
+        result = self._make_client().run("journalctl -f", expect="ready")
+
+        assert result.stdout == "booting\nready\n"
+        assert result.returncode == -1
+        exec_result[1].channel.close.assert_called_once()
+
+    def test_expect_absent_reads_to_eof(self, mock_ssh):
+        mock_ssh.exec_command.return_value = self._mock_exec([b"a\n", b"b\n"], "", 0)
+
+        result = self._make_client().run("cmd", expect="zzz")
+
+        assert result.stdout == "a\nb\n"
+        assert result.returncode == 0
+
 
 class TestSSHClientDownload:
     """Tests for SSHClient.download()."""
 
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_download_calls_sftp_get(self, MockSSHClient, tmp_path: Path):
-        mock_ssh = MockSSHClient.return_value
+    def test_download_calls_sftp_get(self, mock_ssh, tmp_path: Path):
         mock_sftp = MagicMock()
         mock_ssh.open_sftp.return_value = mock_sftp
 
@@ -182,13 +242,26 @@ class TestSSHClientDownload:
         # parent directory should have been created
         assert local.parent.is_dir()
 
+    def test_reuses_sftp_session(self, mock_ssh, tmp_path: Path):
+        client = SSHClient(
+            host="h", user="u", key_path=Path("/tmp/fake_key")
+        )
+        client.download("/remote/a.png", tmp_path / "a.png")
+        client.download("/remote/b.png", tmp_path / "b.png")
+
+        mock_ssh.open_sftp.assert_called_once()
+        mock_sftp = mock_ssh.open_sftp.return_value
+        assert mock_sftp.get.call_count == 2
+        mock_sftp.close.assert_not_called()
+
+        client.close()
+        mock_sftp.close.assert_called_once()
+
 
 class TestSSHClientUpload:
     """Tests for SSHClient.upload()."""
 
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_upload_calls_sftp_put(self, MockSSHClient, tmp_path: Path):
-        mock_ssh = MockSSHClient.return_value
+    def test_upload_calls_sftp_put(self, mock_ssh, tmp_path: Path):
         mock_sftp = MagicMock()
         mock_ssh.open_sftp.return_value = mock_sftp
 
@@ -202,19 +275,96 @@ class TestSSHClientUpload:
         mock_sftp.put.assert_called_once_with(str(local), "/remote/file.txt")
 
 
+class TestConnectionPool:
+    """Tests for the process-wide connection pool behind SSHClient."""
+
+    @pytest.fixture
+    def paramiko_clients(self):
+        """Patch paramiko.SSHClient to hand out a new mock per call."""
+        close_pool()
+        with patch(
+            "vmt.connect.paramiko.SSHClient", side_effect=lambda: MagicMock()
+        ) as MockSSHClient:
+            yield MockSSHClient
+            close_pool()
+
+    def test_same_target_shares_connection(self, paramiko_clients):
+        first = SSHClient(host="h", user="u", key_path=Path("/k"))
+        second = SSHClient(host="h", user="u", key_path=Path("/k"))
+        first.connect()
+        second.connect()
+
+        assert paramiko_clients.call_count == 1
+        assert first._client is second._client
+
+    def test_different_targets_get_own_connection(self, paramiko_clients):
+        SSHClient(host="h", user="u", port=22, key_path=Path("/k")).connect()
+        SSHClient(host="h", user="u", port=2222, key_path=Path("/k")).connect()
+        assert paramiko_clients.call_count == 2
+
+    def test_close_keeps_transport_open(self, paramiko_clients):
+        client = SSHClient(host="h", user="u", key_path=Path("/k"))
+        client.connect()
+        underlying = client._client
+        client.close()
+
+        underlying.close.assert_not_called()
+        SSHClient(host="h", user="u", key_path=Path("/k")).connect()
+        assert paramiko_clients.call_count == 1
+
+        close_pool()
+        underlying.close.assert_called_once()
+
+    def test_dead_transport_is_replaced(self, paramiko_clients):
+        client = SSHClient(host="h", user="u", key_path=Path("/k"))
+        client.connect()
+        client._client.get_transport.return_value.is_active.return_value = False
+        client.close()
+
+        client.connect()
+        assert paramiko_clients.call_count == 2
+
+    def test_evicts_idle_connections_over_cap(self, paramiko_clients, monkeypatch):
+        monkeypatch.setattr("vmt.connect._POOL_SIZE", 1)
+        old = SSHClient(host="old", user="u", key_path=Path("/k"))
+        old.connect()
+        underlying = old._client
+        old.close()
+
+        SSHClient(host="new", user="u", key_path=Path("/k")).connect()
+        underlying.close.assert_called_once()
+
+
 class TestSSHClientWaitUntilReady:
     """Tests for SSHClient.wait_until_ready()."""
 
+    @pytest.fixture(autouse=True)
+    def fake_clock(self):
+        """Virtual clock: sleep() advances monotonic() instead of blocking."""
+        now = [0.0]
+
+        def _sleep(seconds: float) -> None:
+            now[0] += seconds
+
+        with (
+            patch("vmt.connect.time.monotonic", side_effect=lambda: now[0]),
+            patch("vmt.connect.time.sleep", side_effect=_sleep),
+        ):
+            yield now
+
+    @pytest.fixture(autouse=True)
+    def port_open(self):
+        """The TCP probe succeeds unless a test says otherwise."""
+        with patch("vmt.connect._port_open", return_value=True) as probe:
+            yield probe
+
     def test_method_exists(self):
         client = SSHClient(
             host="h", user="u", key_path=Path("/tmp/fake_key")
         )
         assert callable(getattr(client, "wait_until_ready", None))
 
-    @patch("vmt.connect.time.sleep", return_value=None)
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_raises_timeout(self, MockSSHClient, mock_sleep):
-        mock_ssh = MockSSHClient.return_value
+    def test_raises_timeout(self, mock_ssh):
         mock_ssh.connect.side_effect = OSError("refused")
 
         client = SSHClient(
@@ -222,11 +372,9 @@ class TestSSHClientWaitUntilReady:
         )
         with pytest.raises(TimeoutError):
             client.wait_until_ready(timeout=4, interval=1)
+        assert mock_ssh.connect.call_count == 4
 
-    @patch("vmt.connect.time.sleep", return_value=None)
-    @patch("vmt.connect.paramiko.SSHClient")
-    def test_succeeds_after_retries(self, MockSSHClient, mock_sleep):
-        mock_ssh = MockSSHClient.return_value
+    def test_succeeds_after_retries(self, mock_ssh):
         # Fail twice, then succeed
         mock_ssh.connect.side_effect = [OSError("refused"), OSError("refused"), None]
 
@@ -235,3 +383,36 @@ class TestSSHClientWaitUntilReady:
         )
         # Should not raise
         client.wait_until_ready(timeout=120, interval=1)
+
+    def test_skips_handshake_while_port_closed(self, mock_ssh, port_open):
+        port_open.side_effect = [False, False, True]
+
+        client = SSHClient(
+            host="h", user="u", key_path=Path("/tmp/fake_key")
+        )
+        client.wait_until_ready(timeout=120, interval=1)
+        assert mock_ssh.connect.call_count == 1
+
+    def test_timeout_reports_closed_port(self, mock_ssh, port_open):
+        port_open.return_value = False
+
+        client = SSHClient(
+            host="h", user="u", key_path=Path("/tmp/fake_key")
+        )
+        with pytest.raises(TimeoutError, match="port 22 not open"):
+            client.wait_until_ready(timeout=3, interval=1)
+        mock_ssh.connect.assert_not_called()
+
+
+class TestPortOpen:
+    def test_open_port(self):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            assert _port_open("127.0.0.1", server.getsockname()[1])
+
+    def test_closed_port(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        assert not _port_open("127.0.0.1", port)
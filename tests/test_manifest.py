@@ -1,9 +1,37 @@
 """Tests for vmt.manifest — VM and test manifest parsing."""
 
+import hashlib
+
 import pytest
 from pathlib import Path
+from unittest.mock import patch
+
+from vmt.manifest import (
+    _cache_home,
+    _parse_toml,
+    _VM_DEFAULTS,
+    find_manifest,
+    load_test_manifest,
+    load_vm_manifest,
+)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
 
-from vmt.manifest import load_vm_manifest, load_test_manifest, find_manifest
+@pytest.fixture(scope="session")
+def manifest_file(tmp_path_factory):
+    """Factory writing a TOML body to a content-addressed file, once per session."""
+    root = tmp_path_factory.mktemp("manifests")
+
+    def _write(body: str) -> Path:
+        p = root / f"{hashlib.sha1(body.encode()).hexdigest()}.toml"
+        if not p.exists():
+            p.write_text(body)
+        return p
+
+    return _write
 
 
 # ---------------------------------------------------------------------------
@@ -13,10 +41,9 @@ from vmt.manifest import load_vm_manifest, load_test_manifest, find_manifest
 class TestLoadVmManifest:
     """Tests for load_vm_manifest()."""
 
-    def test_valid_full_manifest(self, tmp_path):
+    def test_valid_full_manifest(self, manifest_file):
         """All sections and fields present — should load without error."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "arch-sway"
 image = "archlinux-2024.01.01.qcow2"
@@ -43,10 +70,9 @@ port = 2222
         assert m["ssh"]["user"] == "root"
         assert m["ssh"]["port"] == 2222
 
-    def test_missing_vm_section(self, tmp_path):
+    def test_missing_vm_section(self, manifest_file):
         """Missing [vm] section should raise ValueError."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [provision]
 packages = []
 
@@ -56,10 +82,9 @@ user = "root"
         with pytest.raises(ValueError, match="vm"):
             load_vm_manifest(p)
 
-    def test_missing_provision_section(self, tmp_path):
+    def test_missing_provision_section(self, manifest_file):
         """Missing [provision] section should raise ValueError."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "test"
 image = "test.qcow2"
@@ -70,10 +95,9 @@ user = "root"
         with pytest.raises(ValueError, match="provision"):
             load_vm_manifest(p)
 
-    def test_missing_ssh_section(self, tmp_path):
+    def test_missing_ssh_section(self, manifest_file):
         """Missing [ssh] section should raise ValueError."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "test"
 image = "test.qcow2"
@@ -84,10 +108,19 @@ packages = []
         with pytest.raises(ValueError, match="ssh"):
             load_vm_manifest(p)
 
-    def test_missing_name_field(self, tmp_path):
+    def test_missing_sections_all_reported(self, manifest_file):
+        """Every missing section is named in a single error."""
+        p = manifest_file("""\
+[vm]
+name = "test"
+image = "test.qcow2"
+""")
+        with pytest.raises(ValueError, match=r"\[provision\], \[ssh\]"):
+            load_vm_manifest(p)
+
+    def test_missing_name_field(self, manifest_file):
         """Missing vm.name should raise ValueError."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 image = "test.qcow2"
 
@@ -100,10 +133,9 @@ user = "root"
         with pytest.raises(ValueError, match="name"):
             load_vm_manifest(p)
 
-    def test_missing_image_field(self, tmp_path):
+    def test_missing_image_field(self, manifest_file):
         """Missing vm.image should raise ValueError."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "test"
 
@@ -116,10 +148,23 @@ user = "root"
         with pytest.raises(ValueError, match="image"):
             load_vm_manifest(p)
 
-    def test_defaults_applied(self, tmp_path):
+    def test_missing_fields_all_reported(self, manifest_file):
+        p = manifest_file("""\
+[vm]
+memory = 1024
+
+[provision]
+packages = []
+
+[ssh]
+user = "root"
+""")
+        with pytest.raises(ValueError, match=r"vm field\(s\): image, name"):
+            load_vm_manifest(p)
+
+    def test_defaults_applied(self, manifest_file):
         """When memory/cpus/disk are omitted, defaults should be filled in."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "minimal"
 image = "base.qcow2"
@@ -135,10 +180,9 @@ user = "root"
         assert m["vm"]["cpus"] == 2
         assert m["vm"]["disk"] == 10
 
-    def test_provision_env_defaults_to_empty(self, tmp_path):
+    def test_provision_env_defaults_to_empty(self, manifest_file):
         """If provision.env is missing, it should default to empty dict."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "no-env"
 image = "base.qcow2"
@@ -152,10 +196,9 @@ user = "root"
         m = load_vm_manifest(p)
         assert m["provision"]["env"] == {}
 
-    def test_partial_defaults_not_overwritten(self, tmp_path):
+    def test_partial_defaults_not_overwritten(self, manifest_file):
         """Explicit values should not be overwritten by defaults."""
-        p = tmp_path / "vm.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [vm]
 name = "custom"
 image = "base.qcow2"
@@ -172,6 +215,48 @@ user = "root"
         assert m["vm"]["cpus"] == 2  # default
         assert m["vm"]["disk"] == 10  # default
 
+    def test_repeat_loads_are_independent(self, manifest_file):
+        """Cached parses must not leak mutations between callers."""
+        p = manifest_file("""\
+[vm]
+name = "shared"
+image = "base.qcow2"
+
+[provision]
+packages = ["vim"]
+
+[ssh]
+user = "root"
+""")
+        first = load_vm_manifest(p)
+        first["provision"]["packages"].append("emacs")
+        first["provision"]["env"]["FOO"] = "bar"
+        del first["vm"]["memory"]
+
+        second = load_vm_manifest(p)
+        assert second["provision"]["packages"] == ["vim"]
+        assert second["provision"]["env"] == {}
+        assert second["vm"]["memory"] == 2048
+
+    def test_reloads_after_file_changes(self, tmp_path):
+        """Editing the file invalidates the cached parse."""
+        p = tmp_path / "vm.toml"
+        body = """\
+[vm]
+name = "{name}"
+image = "base.qcow2"
+
+[provision]
+packages = []
+
+[ssh]
+user = "root"
+"""
+        p.write_text(body.format(name="before"))
+        assert load_vm_manifest(p)["vm"]["name"] == "before"
+        p.write_text(body.format(name="after-edit"))
+        assert load_vm_manifest(p)["vm"]["name"] == "after-edit"
+
 
 # ---------------------------------------------------------------------------
 # load_test_manifest
@@ -180,10 +265,9 @@ user = "root"
 class TestLoadTestManifest:
     """Tests for load_test_manifest()."""
 
-    def test_valid_test_manifest(self, tmp_path):
+    def test_valid_test_manifest(self, manifest_file):
         """Basic test manifest with [test] and [[scenario]]."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -204,10 +288,9 @@ threshold = 0.95
         assert s["reference"] == "references/launch.png"
         assert s["threshold"] == 0.95
 
-    def test_missing_test_section(self, tmp_path):
+    def test_missing_test_section(self, manifest_file):
         """Missing [test] section should raise ValueError."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [[scenario]]
 name = "launch"
 commands = ["echo hi"]
@@ -215,20 +298,18 @@ commands = ["echo hi"]
         with pytest.raises(ValueError, match="test"):
             load_test_manifest(p)
 
-    def test_missing_scenario_section(self, tmp_path):
+    def test_missing_scenario_section(self, manifest_file):
         """Missing [[scenario]] section should raise ValueError."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 """)
         with pytest.raises(ValueError, match="scenario"):
             load_test_manifest(p)
 
-    def test_multiple_scenarios(self, tmp_path):
+    def test_multiple_scenarios(self, manifest_file):
         """Multiple [[scenario]] entries should all be parsed."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -249,10 +330,9 @@ threshold = 0.98
         assert m["scenario"][1]["name"] == "resize"
         assert m["scenario"][1]["threshold"] == 0.98
 
-    def test_scenario_with_expect_output(self, tmp_path):
+    def test_scenario_with_expect_output(self, manifest_file):
         """Scenario with expect_output field."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -264,10 +344,9 @@ expect_output = "myapp 1.0.0"
         m = load_test_manifest(p)
         assert m["scenario"][0]["expect_output"] == "myapp 1.0.0"
 
-    def test_install_section(self, tmp_path):
+    def test_install_section(self, manifest_file):
         """Test manifest with [install] section."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -281,10 +360,9 @@ commands = ["echo hello"]
         m = load_test_manifest(p)
         assert m["install"]["commands"] == ["make install"]
 
-    def test_distro_specific_install(self, tmp_path):
+    def test_distro_specific_install(self, manifest_file):
         """Test manifest with [install.<distro>] sections."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -306,10 +384,9 @@ commands = ["echo hello"]
         assert m["install"]["ubuntu"]["commands"] == ["apt-get install -y myapp"]
         assert m["install"]["commands"] == ["make install"]
 
-    def test_screenshot_without_reference(self, tmp_path):
+    def test_screenshot_without_reference(self, manifest_file):
         """Scenario with screenshot but no reference (for initial capture)."""
-        p = tmp_path / "test.toml"
-        p.write_text("""\
+        p = manifest_file("""\
 [test]
 vm = "arch-sway"
 
@@ -323,6 +400,132 @@ screenshot = "initial.png"
         assert s["screenshot"] == "initial.png"
         assert "reference" not in s
 
+    def test_results_are_private_copies(self, manifest_file):
+        p = manifest_file("""\
+[test]
+vm = "arch-sway"
+
+[[scenario]]
+name = "launch"
+""")
+        m = load_test_manifest(p)
+        m["scenario"][0]["name"] = "other"
+        m["scenario"].append({"name": "extra"})
+        assert load_test_manifest(p)["scenario"] == [{"name": "launch"}]
+
+    def test_reloads_after_file_changes(self, tmp_path):
+        p = tmp_path / "t.toml"
+        p.write_text('[test]\nvm = "before"\n[[scenario]]\nname = "s"\n')
+        assert load_test_manifest(p)["test"]["vm"] == "before"
+        p.write_text('[test]\nvm = "after-edit"\n[[scenario]]\nname = "s"\n')
+        assert load_test_manifest(p)["test"]["vm"] == "after-edit"
+
+
+# ---------------------------------------------------------------------------
+# On-disk cache
+# ---------------------------------------------------------------------------
+
+class TestManifestDiskCache:
+    """Tests for the JSON cache behind both loaders."""
+
+    BODY = """\
+[test]
+vm = "arch-sway"
+
+[[scenario]]
+name = "launch"
+commands = ["myapp &"]
+"""
+
+    def test_second_load_skips_parsing(self, tmp_path, manifest_cache_dir):
+        p = tmp_path / "t.toml"
+        p.write_text(self.BODY)
+        first = load_test_manifest(p)
+        assert len(list(manifest_cache_dir.glob("*.json"))) == 1
+
+        _parse_toml.cache_clear()
+        with patch("vmt.manifest.tomllib.loads", side_effect=AssertionError):
+            assert load_test_manifest(p) == first
+
+    @pytest.mark.parametrize(
+        "target, value",
+        [
+            ("vmt.manifest.__version__", "99.0.0"),
+            ("vmt.manifest._CACHE_FORMAT", 99),
+            ("vmt.manifest._TEST_REQUIRED_SECTIONS", frozenset(("test",))),
+        ],
+    )
+    def test_version_or_schema_change_misses(
+        self, tmp_path, manifest_cache_dir, monkeypatch, target, value
+    ):
+        p = tmp_path / "t.toml"
+        p.write_text(self.BODY)
+        load_test_manifest(p)
+
+        (old,) = manifest_cache_dir.glob("*.json")
+
+        monkeypatch.setattr(target, value)
+        load_test_manifest(p)
+        (new,) = manifest_cache_dir.glob("*.json")
+        assert new != old
+
+    def test_edit_replaces_entry(self, tmp_path, manifest_cache_dir):
+        p = tmp_path / "t.toml"
+        other = tmp_path / "other.toml"
+        p.write_text(self.BODY)
+        other.write_text(self.BODY)
+        load_test_manifest(p)
+        load_test_manifest(other)
+
+        p.write_text(self.BODY.replace("launch", "start"))
+        assert load_test_manifest(p)["scenario"][0]["name"] == "start"
+        assert len(list(manifest_cache_dir.glob("*.json"))) == 2
+
+    @pytest.mark.parametrize(
+        "xdg, expected",
+        [
+            ("/xdg/cache", Path("/xdg/cache")),
+            ("", Path.home() / ".cache"),
+            ("relative", Path.home() / ".cache"),
+        ],
+    )
+    def test_cache_home_honors_xdg(self, monkeypatch, xdg, expected):
+        monkeypatch.setenv("XDG_CACHE_HOME", xdg)
+        assert _cache_home() == expected
+
+    def test_stale_vm_defaults_not_served(self, tmp_path, monkeypatch):
+        p = tmp_path / "vm.toml"
+        p.write_text(
+            '[vm]\nname = "v"\nimage = "i"\n[provision]\n[ssh]\nuser = "u"\n'
+        )
+        assert load_vm_manifest(p)["vm"]["memory"] == 2048
+
+        defaults = {**_VM_DEFAULTS, "vm": {**_VM_DEFAULTS["vm"], "memory": 4096}}
+        monkeypatch.setattr("vmt.manifest._VM_DEFAULTS", defaults)
+        assert load_vm_manifest(p)["vm"]["memory"] == 4096
+
+    def test_corrupt_entry_is_ignored(self, tmp_path, manifest_cache_dir):
+        p = tmp_path / "t.toml"
+        p.write_text(self.BODY)
+        expected = load_test_manifest(p)
+        (entry,) = manifest_cache_dir.glob("*.json")
+        entry.write_text("{not json")
+
+        assert load_test_manifest(p) == expected
+
+    def test_dates_are_not_cached(self, tmp_path, manifest_cache_dir):
+        p = tmp_path / "t.toml"
+        p.write_text(self.BODY.replace("[test]", "[test]\nsince = 2024-01-01"))
+        assert str(load_test_manifest(p)["test"]["since"]) == "2024-01-01"
+        assert list(manifest_cache_dir.glob("*.json")) == []
+
+    def test_validation_errors_are_not_cached(self, tmp_path, manifest_cache_dir):
+        p = tmp_path / "t.toml"
+        p.write_text('[test]\nvm = "arch-sway"\n')
+        with pytest.raises(ValueError):
+            load_test_manifest(p)
+        assert list(manifest_cache_dir.glob("*.json")) == []
+
 
 # ---------------------------------------------------------------------------
 # find_manifest
@@ -331,6 +534,11 @@ screenshot = "initial.png"
 class TestFindManifest:
     """Tests for find_manifest()."""
 
+    @pytest.fixture
+    def tmp_path(self, fs):
+        """Search directories live on an in-memory filesystem."""
+        return Path(fs.create_dir("/search").path)
+
     def test_find_in_single_directory(self, tmp_path):
         """Find a manifest in a single search directory."""
         (tmp_path / "myvm.toml").write_text("[vm]\nname='x'\nimage='y'\n")
@@ -342,28 +550,55 @@ class TestFindManifest:
         with pytest.raises(FileNotFoundError):
             find_manifest("nonexistent", [tmp_path])
 
-    def test_searches_multiple_directories(self, tmp_path):
-        """Should search across multiple directories, returning first match."""
-        d1 = tmp_path / "dir1"
-        d2 = tmp_path / "dir2"
-        d1.mkdir()
-        d2.mkdir()
-        (d2 / "found.toml").write_text("[vm]\nname='x'\nimage='y'\n")
-        result = find_manifest("found", [d1, d2])
-        assert result == d2 / "found.toml"
-
-    def test_first_directory_wins(self, tmp_path):
-        """If manifest exists in multiple dirs, first one wins."""
+    @pytest.fixture
+    def two_dirs(self, tmp_path):
         d1 = tmp_path / "dir1"
         d2 = tmp_path / "dir2"
         d1.mkdir()
         d2.mkdir()
-        (d1 / "dup.toml").write_text("first")
-        (d2 / "dup.toml").write_text("second")
-        result = find_manifest("dup", [d1, d2])
-        assert result == d1 / "dup.toml"
+        return d1, d2
+
+    @pytest.mark.parametrize(
+        ("present_in", "expected"),
+        [
+            # Only the second directory has it: search falls through.
+            ((1,), 1),
+            # Both have it: the first directory wins.
+            ((0, 1), 0),
+        ],
+        ids=["searches-multiple", "first-wins"],
+    )
+    def test_search_order(self, two_dirs, present_in, expected):
+        """Directories are searched in order, returning the first match."""
+        for i in present_in:
+            (two_dirs[i] / "vm.toml").write_text("[vm]\nname='x'\nimage='y'\n")
+        result = find_manifest("vm", list(two_dirs))
+        assert result == two_dirs[expected] / "vm.toml"
 
     def test_empty_search_dirs(self):
         """Empty search dirs list should raise FileNotFoundError."""
         with pytest.raises(FileNotFoundError):
             find_manifest("anything", [])
+
+    def test_directory_change_is_seen(self, tmp_path):
+        """Adding or removing a manifest is seen by the next lookup."""
+        (tmp_path / "myvm.toml").write_text("[vm]\nname='x'\nimage='y'\n")
+        find_manifest("myvm", [tmp_path])
+        with pytest.raises(FileNotFoundError):
+            find_manifest("missing", [tmp_path])
+        (tmp_path / "myvm.toml").unlink()
+        (tmp_path / "missing.toml").write_text("")
+
+        assert find_manifest("missing", [tmp_path]) == tmp_path / "missing.toml"
+        with pytest.raises(FileNotFoundError):
+            find_manifest("myvm", [tmp_path])
+
+    def test_skips_directories_named_like_manifests(self, tmp_path):
+        (tmp_path / "vm.toml").mkdir()
+        with pytest.raises(FileNotFoundError):
+            find_manifest("vm", [tmp_path])
+
+    def test_missing_search_dir_is_skipped(self, tmp_path):
+        (tmp_path / "vm.toml").write_text("")
+        result = find_manifest("vm", [tmp_path / "absent", tmp_path])
+        assert result == tmp_path / "vm.toml"
@@ -1,19 +1,36 @@
 """Tests for vmt.provision — cloud-init generation."""
 
-import shutil
-import tempfile
-from pathlib import Path
+import io
+from pathlib import PurePosixPath
 
+import pycdlib
 import pytest
 import yaml
 
 from vmt.provision import (
     _is_arch_manifest,
+    _yaml_quote,
     create_cloud_init_iso,
     generate_meta_data,
     generate_user_data,
 )
 
+# Use libyaml's C parser when PyYAML was built with it.
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _load(text: str):
+    return yaml.load(text, Loader=_Loader)
+
+
+def _any_cmd(cmds: list, needle: str) -> bool:
+    """True if any cloud-init command (string or argv list) contains needle."""
+    return any(
+        needle in (c if isinstance(c, str) else " ".join(map(str, c)))
+        for c in cmds
+    )
+
+
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -33,36 +50,69 @@ SAMPLE_MANIFEST = {
 SAMPLE_SSH_KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAITestKey test@host"
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def manifest():
     return SAMPLE_MANIFEST
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def ssh_key():
     return SAMPLE_SSH_KEY
 
 
+@pytest.fixture(scope="module")
+def user_data_parsed(manifest, ssh_key):
+    """(user-data string, parsed cloud-config) for SAMPLE_MANIFEST, built once."""
+    result = generate_user_data(manifest, ssh_key)
+    return result, _load(result.split("\n", 1)[1])
+
+
+@pytest.fixture(scope="module")
+def write_files(user_data_parsed):
+    """SAMPLE_MANIFEST's write_files entries keyed by file basename."""
+    _result, data = user_data_parsed
+    return {PurePosixPath(f["path"]).name: f for f in data["write_files"]}
+
+
+@pytest.fixture(scope="module")
+def arch_user_data_parsed(ssh_key):
+    """Parsed cloud-config for an Arch Linux manifest, built once."""
+    arch_manifest = {
+        "vm": {"image": "https://mirror.archlinux.org/Arch-Linux-x86_64-cloudimg.qcow2"},
+        "ssh": {"user": "arch"},
+        "provision": {
+            "packages": ["sway"],
+            "compositor_cmd": "sway",
+            "env": {},
+        },
+    }
+    result = generate_user_data(arch_manifest, ssh_key)
+    return _load(result.split("\n", 1)[1])
+
+
+@pytest.fixture(scope="module")
+def meta_data_parsed():
+    """Parsed meta-data for a VM named "myvm", built once."""
+    return _load(generate_meta_data("myvm"))
+
+
 # ---------------------------------------------------------------------------
 # generate_user_data
 # ---------------------------------------------------------------------------
 
 
 class TestGenerateUserData:
-    def test_starts_with_cloud_config_header(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
+    def test_starts_with_cloud_config_header(self, user_data_parsed):
+        result, _data = user_data_parsed
         assert result.startswith("#cloud-config\n")
 
-    def test_produces_valid_yaml(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        # Strip the #cloud-config header line before parsing
-        yaml_body = result.split("\n", 1)[1]
-        data = yaml.safe_load(yaml_body)
+    def test_produces_valid_yaml(self, user_data_parsed):
+        # The fixture fails to parse invalid YAML; check it's a mapping.
+        _result, data = user_data_parsed
         assert isinstance(data, dict)
 
-    def test_user_entry(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_user_entry(self, user_data_parsed, ssh_key):
+        _result, data = user_data_parsed
         users = data["users"]
         # First entry may be "default"; find our user
         user = next(u for u in users if isinstance(u, dict) and u["name"] == "vmtuser")
@@ -70,33 +120,23 @@ class TestGenerateUserData:
         assert "sudo" in user
         assert "NOPASSWD" in user["sudo"]
 
-    def test_user_groups(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_user_groups(self, user_data_parsed):
+        _result, data = user_data_parsed
         user = next(u for u in data["users"] if isinstance(u, dict))
         groups = user["groups"]
         assert "video" in groups
         assert "audio" in groups
 
-    def test_package_update(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_package_update(self, user_data_parsed):
+        _result, data = user_data_parsed
         assert data["package_update"] is True
 
-    def test_packages_list(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_packages_list(self, user_data_parsed):
+        _result, data = user_data_parsed
         assert data["packages"] == ["weston", "mesa-utils", "xdg-utils"]
 
-    def test_compositor_service_in_write_files(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        write_files = data["write_files"]
-        service_file = next(
-            f
-            for f in write_files
-            if "test-compositor.service" in f["path"]
-        )
+    def test_compositor_service_in_write_files(self, write_files):
+        service_file = write_files["test-compositor.service"]
         assert service_file["path"] == "/home/vmtuser/.config/systemd/user/test-compositor.service"
         content = service_file["content"]
         assert "ExecStart=/usr/bin/weston --backend=drm" in content
@@ -104,92 +144,53 @@ class TestGenerateUserData:
         assert 'Environment="WLR_BACKENDS=headless"' in content
         assert 'Environment="XDG_RUNTIME_DIR=/run/user/1000"' in content
 
-    def test_runcmd_enable_linger(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        runcmd = data["runcmd"]
-        linger_cmds = [c for c in runcmd if "loginctl" in str(c) and "enable-linger" in str(c)]
-        assert len(linger_cmds) >= 1
-
-    def test_runcmd_starts_pipewire(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        runcmd = data["runcmd"]
-        runcmd_str = str(runcmd)
-        assert "pipewire" in runcmd_str
-
-    def test_runcmd_starts_compositor(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        runcmd = data["runcmd"]
-        runcmd_str = str(runcmd)
-        assert "test-compositor" in runcmd_str
-
-    def test_chpasswd_no_expire(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_runcmd_enable_linger(self, user_data_parsed):
+        _result, data = user_data_parsed
+        assert _any_cmd(data["runcmd"], "loginctl enable-linger")
+
+    def test_runcmd_starts_pipewire(self, user_data_parsed):
+        _result, data = user_data_parsed
+        assert _any_cmd(data["runcmd"], "pipewire")
+
+    def test_runcmd_starts_compositor(self, user_data_parsed):
+        _result, data = user_data_parsed
+        assert _any_cmd(data["runcmd"], "test-compositor")
+
+    def test_chpasswd_no_expire(self, user_data_parsed):
+        _result, data = user_data_parsed
         assert data["chpasswd"] == {"expire": False}
 
-    def test_user_password_fields(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
+    def test_user_password_fields(self, user_data_parsed):
+        _result, data = user_data_parsed
         user = next(u for u in data["users"] if isinstance(u, dict))
         assert user["lock_passwd"] is False
         assert user["plain_text_passwd"] == "vmt"
 
-    def test_local_bin_in_path(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        bashrc_file = next(
-            f for f in data["write_files"]
-            if f["path"].endswith(".bashrc")
-        )
+    def test_local_bin_in_path(self, write_files):
+        bashrc_file = write_files[".bashrc"]
         assert '$HOME/.local/bin' in bashrc_file["content"]
         assert "PATH" in bashrc_file["content"]
 
-    def test_autologin_conf_in_write_files(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        autologin_file = next(
-            f for f in data["write_files"]
-            if "autologin.conf" in f["path"]
-        )
+    def test_autologin_conf_in_write_files(self, write_files):
+        autologin_file = write_files["autologin.conf"]
         assert autologin_file["path"] == "/etc/systemd/system/getty@tty1.service.d/autologin.conf"
         assert "--autologin vmtuser" in autologin_file["content"]
 
-    def test_bash_profile_compositor_launch(self, manifest, ssh_key):
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        profile_file = next(
-            f for f in data["write_files"]
-            if f["path"].endswith(".bash_profile")
-        )
+    def test_bash_profile_compositor_launch(self, write_files):
+        profile_file = write_files[".bash_profile"]
         content = profile_file["content"]
         assert '$(tty)" = "/dev/tty1"' in content
         assert "exec /usr/bin/weston --backend=drm" in content
 
-    def test_pacman_key_for_arch_manifest(self, ssh_key):
-        arch_manifest = {
-            "vm": {"image": "https://mirror.archlinux.org/Arch-Linux-x86_64-cloudimg.qcow2"},
-            "ssh": {"user": "arch"},
-            "provision": {
-                "packages": ["sway"],
-                "compositor_cmd": "sway",
-                "env": {},
-            },
-        }
-        result = generate_user_data(arch_manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        bootcmd_str = str(data["bootcmd"])
-        assert "pacman-key --init" in bootcmd_str
-        assert "pacman-key --populate archlinux" in bootcmd_str
-
-    def test_no_pacman_key_for_non_arch(self, manifest, ssh_key):
+    def test_pacman_key_for_arch_manifest(self, arch_user_data_parsed):
+        bootcmd = arch_user_data_parsed["bootcmd"]
+        assert _any_cmd(bootcmd, "pacman-key --init")
+        assert _any_cmd(bootcmd, "pacman-key --populate archlinux")
+
+    def test_no_pacman_key_for_non_arch(self, user_data_parsed):
         """Non-Arch manifest should not have pacman-key in bootcmd."""
-        result = generate_user_data(manifest, ssh_key)
-        data = yaml.safe_load(result.split("\n", 1)[1])
-        bootcmd_str = str(data["bootcmd"])
-        assert "pacman-key" not in bootcmd_str
+        _result, data = user_data_parsed
+        assert not _any_cmd(data["bootcmd"], "pacman-key")
 
 
 # ---------------------------------------------------------------------------
@@ -210,26 +211,43 @@ class TestIsArchManifest:
         assert _is_arch_manifest({}) is False
 
 
+# ---------------------------------------------------------------------------
+# _yaml_quote
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "plain",
+        "",
+        'say "hi" \\ bye',
+        "key: value # comment",
+        "multi\nline\ttext\n",
+        "- [not, a, list]",
+        "yes",
+        "unicode é 🙂",
+        "nel\x85del\x7fsep\u2028bom\ufeff",
+    ],
+)
+def test_yaml_quote_round_trips(value):
+    assert _load(f"k: {_yaml_quote(value)}") == {"k": value}
+
+
 # ---------------------------------------------------------------------------
 # generate_meta_data
 # ---------------------------------------------------------------------------
 
 
 class TestGenerateMetaData:
-    def test_produces_valid_yaml(self):
-        result = generate_meta_data("myvm")
-        data = yaml.safe_load(result)
-        assert isinstance(data, dict)
+    def test_produces_valid_yaml(self, meta_data_parsed):
+        assert isinstance(meta_data_parsed, dict)
 
-    def test_instance_id(self):
-        result = generate_meta_data("myvm")
-        data = yaml.safe_load(result)
-        assert data["instance-id"] == "vmt-myvm"
+    def test_instance_id(self, meta_data_parsed):
+        assert meta_data_parsed["instance-id"] == "vmt-myvm"
 
-    def test_hostname(self):
-        result = generate_meta_data("myvm")
-        data = yaml.safe_load(result)
-        assert data["local-hostname"] == "myvm"
+    def test_hostname(self, meta_data_parsed):
+        assert meta_data_parsed["local-hostname"] == "myvm"
 
 
 # ---------------------------------------------------------------------------
@@ -237,16 +255,44 @@ class TestGenerateMetaData:
 # ---------------------------------------------------------------------------
 
 
-@pytest.mark.skipif(
-    shutil.which("cloud-localds") is None,
-    reason="cloud-localds not installed",
-)
+@pytest.fixture(scope="session")
+def seed_iso(tmp_path_factory):
+    """A NoCloud ISO built once per session by create_cloud_init_iso()."""
+    output = tmp_path_factory.mktemp("iso") / "seed.iso"
+    create_cloud_init_iso(
+        "#cloud-config\npackages: [vim]\n",
+        "instance-id: test\nlocal-hostname: test\n",
+        output,
+    )
+    return output
+
+
 class TestCreateCloudInitIso:
-    def test_creates_iso_file(self):
-        user_data = "#cloud-config\npackages: [vim]\n"
-        meta_data = "instance-id: test\nlocal-hostname: test\n"
-        with tempfile.TemporaryDirectory() as tmpdir:
-            output = Path(tmpdir) / "seed.iso"
-            create_cloud_init_iso(user_data, meta_data, output)
-            assert output.exists()
-            assert output.stat().st_size > 0
+    @staticmethod
+    def _read(iso_path, joliet_path: str) -> str:
+        iso = pycdlib.PyCdlib()
+        iso.open(str(iso_path))
+        try:
+            buf = io.BytesIO()
+            iso.get_file_from_iso_fp(buf, joliet_path=joliet_path)
+            return buf.getvalue().decode()
+        finally:
+            iso.close()
+
+    def test_creates_iso_file(self, seed_iso):
+        assert seed_iso.exists()
+        assert seed_iso.stat().st_size > 0
+
+    def test_volume_label_is_cidata(self, seed_iso):
+        iso = pycdlib.PyCdlib()
+        iso.open(str(seed_iso))
+        try:
+            assert iso.pvd.volume_identifier.rstrip() == b"cidata"
+        finally:
+            iso.close()
+
+    def test_contains_seed_files(self, seed_iso):
+        assert self._read(seed_iso, "/user-data") == "#cloud-config\npackages: [vim]\n"
+        assert self._read(seed_iso, "/meta-data") == (
+            "instance-id: test\nlocal-hostname: test\n"
+        )
@@ -6,20 +6,95 @@ from pathlib import Path
 
 import numpy as np
 import pytest
-from skimage.io import imsave
+from PIL import Image
 
-from vmt.screenshot import compare_screenshots, generate_diff_image
+from vmt import screenshot
+from vmt.screenshot import (
+    compare_screenshots,
+    compare_screenshots_batch,
+    generate_diff_image,
+)
 
 
 # ── helpers ──────────────────────────────────────────────────────────
 
 
-def _solid_image(tmp_path: Path, name: str, color: tuple[int, ...]) -> Path:
-    """Create a 64x64 solid-color RGB image and return its path."""
-    img = np.full((64, 64, 3), color, dtype=np.uint8)
-    path = tmp_path / name
-    imsave(str(path), img)
-    return path
+def _save_png(img: np.ndarray, path: Path) -> None:
+    """Write a uint8 RGB/RGBA array as PNG with cheap compression."""
+    Image.fromarray(img).save(path, format="PNG", compress_level=1)
+
+
+def _has_color(img: np.ndarray, rgb: tuple[int, int, int]) -> bool:
+    """True if any pixel of an RGB(A) image equals rgb exactly."""
+    packed = (
+        (img[..., 0].astype(np.uint32) << 16)
+        | (img[..., 1].astype(np.uint32) << 8)
+        | img[..., 2]
+    )
+    return bool((packed == ((rgb[0] << 16) | (rgb[1] << 8) | rgb[2])).any())
+
+
+# ── fixtures ─────────────────────────────────────────────────────────
+
+
+@pytest.fixture(scope="session")
+def solid_image(tmp_path_factory):
+    """Factory returning a 64x64 solid-color RGB PNG, encoded once per color.
+
+    The same Path is handed out for repeated colors; the functions under
+    test only read their inputs.
+    """
+    root = tmp_path_factory.mktemp("solid")
+    cache: dict[tuple[int, ...], Path] = {}
+
+    def _make(color: tuple[int, ...]) -> Path:
+        if color not in cache:
+            img = np.full((64, 64, 3), color, dtype=np.uint8)
+            path = root / f"{'-'.join(map(str, color))}.png"
+            _save_png(img, path)
+            cache[color] = path
+        return cache[color]
+
+    return _make
+
+
+@pytest.fixture(scope="session")
+def noisy_pair(tmp_path_factory):
+    """A textured 128x128 image and a copy with +/-5 noise (seeded)."""
+    rng = np.random.default_rng(42)
+    # Use a textured base so SSIM has meaningful local variance.
+    base = rng.integers(50, 200, size=(128, 128, 3), dtype=np.uint8)
+    noise = rng.integers(-5, 6, size=base.shape, dtype=np.int16)
+    noisy = np.clip(base.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    root = tmp_path_factory.mktemp("noise")
+    a_path = root / "a.png"
+    b_path = root / "b.png"
+    _save_png(base, a_path)
+    _save_png(noisy, b_path)
+    return a_path, b_path
+
+
+# ── _load_rgb ────────────────────────────────────────────────────────
+
+
+class TestLoadRgb:
+    """Tests for the decode cache behind _load_rgb()."""
+
+    def test_repeat_loads_share_decode(self, solid_image):
+        path = solid_image((1, 2, 3))
+        first = screenshot._load_rgb(path)
+
+        assert screenshot._load_rgb(path) is first
+        assert not first.flags.writeable
+
+    def test_reloads_after_file_changes(self, tmp_path: Path):
+        path = tmp_path / "img.png"
+        _save_png(np.zeros((4, 4, 3), dtype=np.uint8), path)
+        assert screenshot._load_rgb(path).max() == 0
+
+        _save_png(np.full((4, 5, 3), 7, dtype=np.uint8), path)
+        assert screenshot._load_rgb(path).shape == (4, 5, 3)
 
 
 # ── compare_screenshots ─────────────────────────────────────────────
@@ -28,53 +103,51 @@ def _solid_image(tmp_path: Path, name: str, color: tuple[int, ...]) -> Path:
 class TestCompareScreenshots:
     """Tests for compare_screenshots()."""
 
-    def test_identical_images(self, tmp_path: Path):
+    def test_identical_images(self, solid_image):
         """Identical images produce a score of 1.0 and pass."""
-        a = _solid_image(tmp_path, "a.png", (120, 200, 50))
-        b = _solid_image(tmp_path, "b.png", (120, 200, 50))
+        a = solid_image((120, 200, 50))
+        b = solid_image((120, 200, 50))
 
         passed, score = compare_screenshots(a, b)
 
-        assert score == pytest.approx(1.0)
+        assert score == pytest.approx(1.0, abs=1e-3)
         assert passed is True
 
-    def test_completely_different_images(self, tmp_path: Path):
+    def test_identical_images_skip_ssim(self, solid_image, monkeypatch):
+        """Pixel-identical images short-circuit to a perfect score."""
+        monkeypatch.setattr(screenshot, "structural_similarity", pytest.fail)
+        img = solid_image((10, 20, 30))
+
+        assert compare_screenshots(img, img, threshold=1.0) == (True, 1.0)
+
+    def test_completely_different_images(self, solid_image):
         """Completely different images score below 0.95 and fail."""
-        a = _solid_image(tmp_path, "a.png", (0, 0, 0))
-        b = _solid_image(tmp_path, "b.png", (255, 255, 255))
+        a = solid_image((0, 0, 0))
+        b = solid_image((255, 255, 255))
 
         passed, score = compare_screenshots(a, b)
 
         assert score < 0.95
         assert passed is False
 
-    def test_similar_images_with_noise(self, tmp_path: Path):
+    def test_similar_images_with_noise(self, noisy_pair):
         """Images with small noise pass at a 0.90 threshold."""
-        rng = np.random.default_rng(42)
-        # Use a textured base so SSIM has meaningful local variance.
-        base = rng.integers(50, 200, size=(128, 128, 3), dtype=np.uint8)
-        noise = rng.integers(-5, 6, size=base.shape, dtype=np.int16)
-        noisy = np.clip(base.astype(np.int16) + noise, 0, 255).astype(np.uint8)
-
-        a_path = tmp_path / "a.png"
-        b_path = tmp_path / "b.png"
-        imsave(str(a_path), base)
-        imsave(str(b_path), noisy)
+        a_path, b_path = noisy_pair
 
         passed, score = compare_screenshots(a_path, b_path, threshold=0.90)
 
         assert passed is True
         assert score >= 0.90
 
-    def test_custom_threshold(self, tmp_path: Path):
+    def test_custom_threshold(self, solid_image, tmp_path: Path):
         """A very high threshold causes even similar images to fail."""
-        a = _solid_image(tmp_path, "a.png", (100, 100, 100))
+        a = solid_image((100, 100, 100))
 
         # Create a slightly different image
         img = np.full((64, 64, 3), (100, 100, 100), dtype=np.uint8)
         img[:32, :, :] = (110, 110, 110)
         b_path = tmp_path / "b.png"
-        imsave(str(b_path), img)
+        _save_png(img, b_path)
 
         passed, score = compare_screenshots(a, b_path, threshold=0.9999)
 
@@ -88,27 +161,94 @@ class TestCompareScreenshots:
 
         a_path = tmp_path / "a.png"
         b_path = tmp_path / "b.png"
-        imsave(str(a_path), actual)
-        imsave(str(b_path), ref)
+        _save_png(actual, a_path)
+        _save_png(ref, b_path)
 
         passed, score = compare_screenshots(a_path, b_path)
 
         assert passed is True
         assert score >= 0.95
 
+    def test_large_images_downsampled_before_ssim(
+        self, tmp_path: Path, monkeypatch
+    ):
+        """SSIM runs on a ~256px-short-side average-pooled copy."""
+        rng = np.random.default_rng(0)
+        img = rng.integers(0, 256, (601, 1024, 3), dtype=np.uint8)
+        a_path = tmp_path / "a.png"
+        b_path = tmp_path / "b.png"
+        _save_png(img, a_path)
+        img[0, 0, 0] ^= 1
+        _save_png(img, b_path)
+
+        shapes = []
+        real_ssim = screenshot.structural_similarity
+
+        def _spy(a, b, **kwargs):
+            shapes.append(a.shape)
+            return real_ssim(a, b, **kwargs)
+
+        monkeypatch.setattr(screenshot, "structural_similarity", _spy)
+        passed, score = compare_screenshots(a_path, b_path)
+
+        # factor round(601 / 256) = 2; the odd last row is cropped.
+        assert shapes == [(300, 512, 3)]
+        assert passed is True
+        assert score == pytest.approx(1.0)
+
     def test_rgba_images(self, tmp_path: Path):
         """RGBA images are handled by stripping the alpha channel."""
         img_rgba = np.full((64, 64, 4), (120, 200, 50, 255), dtype=np.uint8)
         a_path = tmp_path / "a.png"
         b_path = tmp_path / "b.png"
-        imsave(str(a_path), img_rgba)
-        imsave(str(b_path), img_rgba)
+        _save_png(img_rgba, a_path)
+        _save_png(img_rgba, b_path)
 
         passed, score = compare_screenshots(a_path, b_path)
 
         assert passed is True
         assert score == pytest.approx(1.0)
 
+    def test_grayscale_matches_rgb(self, tmp_path: Path):
+        """A grayscale image compares equal to its RGB expansion."""
+        gray = np.full((64, 64), 90, dtype=np.uint8)
+        a_path = tmp_path / "gray.png"
+        b_path = tmp_path / "rgb.png"
+        _save_png(gray, a_path)
+        _save_png(np.stack([gray] * 3, axis=-1), b_path)
+
+        assert compare_screenshots(a_path, b_path) == (True, 1.0)
+
+
+class TestCompareScreenshotsBatch:
+    """Tests for compare_screenshots_batch()."""
+
+    def test_results_in_input_order(self, solid_image, noisy_pair):
+        black = solid_image((0, 0, 0))
+        white = solid_image((255, 255, 255))
+        pairs = [(black, black), (black, white), noisy_pair, (white, white)]
+
+        results = compare_screenshots_batch(pairs, threshold=0.5)
+
+        assert results == [
+            compare_screenshots(a, r, threshold=0.5) for a, r in pairs
+        ]
+        assert [passed for passed, _score in results] == [True, False, True, True]
+
+    def test_per_pair_thresholds(self, noisy_pair):
+        (_, score), = compare_screenshots_batch([noisy_pair])
+        results = compare_screenshots_batch(
+            [noisy_pair, noisy_pair], threshold=[score, score + 0.01]
+        )
+        assert [passed for passed, _score in results] == [True, False]
+
+    def test_threshold_count_mismatch(self, noisy_pair):
+        with pytest.raises(ValueError, match="thresholds"):
+            compare_screenshots_batch([noisy_pair], threshold=[0.5, 0.5])
+
+    def test_empty(self):
+        assert compare_screenshots_batch([]) == []
+
 
 # ── generate_diff_image ─────────────────────────────────────────────
 
@@ -116,10 +256,10 @@ class TestCompareScreenshots:
 class TestGenerateDiffImage:
     """Tests for generate_diff_image()."""
 
-    def test_creates_file(self, tmp_path: Path):
+    def test_creates_file(self, solid_image, tmp_path: Path):
         """Diff image is created with nonzero size."""
-        a = _solid_image(tmp_path, "a.png", (0, 0, 0))
-        b = _solid_image(tmp_path, "b.png", (255, 255, 255))
+        a = solid_image((0, 0, 0))
+        b = solid_image((255, 255, 255))
         out = tmp_path / "diff.png"
 
         generate_diff_image(a, b, out)
@@ -127,10 +267,10 @@ class TestGenerateDiffImage:
         assert out.exists()
         assert out.stat().st_size > 0
 
-    def test_diff_has_red_pixels(self, tmp_path: Path):
+    def test_diff_has_red_pixels(self, solid_image, tmp_path: Path):
         """Differing regions are painted red in the output."""
-        a = _solid_image(tmp_path, "a.png", (0, 0, 0))
-        b = _solid_image(tmp_path, "b.png", (255, 255, 255))
+        a = solid_image((0, 0, 0))
+        b = solid_image((255, 255, 255))
         out = tmp_path / "diff.png"
 
         generate_diff_image(a, b, out)
@@ -139,13 +279,12 @@ class TestGenerateDiffImage:
 
         diff = imread(str(out))
         # Diff should contain red pixels [255, 0, 0]
-        red_mask = (diff[:, :, 0] == 255) & (diff[:, :, 1] == 0) & (diff[:, :, 2] == 0)
-        assert red_mask.any(), "Expected red pixels in diff image"
+        assert _has_color(diff, (255, 0, 0)), "Expected red pixels in diff image"
 
-    def test_identical_images_no_red(self, tmp_path: Path):
+    def test_identical_images_no_red(self, solid_image, tmp_path: Path):
         """Identical images produce a diff with no red overlay."""
-        a = _solid_image(tmp_path, "a.png", (120, 200, 50))
-        b = _solid_image(tmp_path, "b.png", (120, 200, 50))
+        a = solid_image((120, 200, 50))
+        b = solid_image((120, 200, 50))
         out = tmp_path / "diff.png"
 
         generate_diff_image(a, b, out)
@@ -153,5 +292,39 @@ class TestGenerateDiffImage:
         from skimage.io import imread
 
         diff = imread(str(out))
-        red_mask = (diff[:, :, 0] == 255) & (diff[:, :, 1] == 0) & (diff[:, :, 2] == 0)
-        assert not red_mask.any(), "Identical images should produce no red pixels"
+        assert not _has_color(diff, (255, 0, 0)), (
+            "Identical images should produce no red pixels"
+        )
+
+    def test_different_sizes(self, tmp_path: Path):
+        """A larger reference is resized before diffing."""
+        a_path = tmp_path / "a.png"
+        b_path = tmp_path / "b.png"
+        _save_png(np.full((32, 48, 3), 100, dtype=np.uint8), a_path)
+        _save_png(np.full((64, 96, 3), 100, dtype=np.uint8), b_path)
+        out = tmp_path / "diff.png"
+
+        generate_diff_image(a_path, b_path, out)
+
+        with Image.open(out) as diff:
+            assert diff.size == (48, 32)
+            assert not _has_color(np.asarray(diff.convert("RGB")), (255, 0, 0))
+
+    def test_marks_differences_over_30_either_way(self, tmp_path: Path):
+        """Only channels differing by more than 30, in either direction, are red."""
+        actual = np.full((1, 4, 3), 100, dtype=np.uint8)
+        ref = actual.copy()
+        ref[0, 0, 0] = 130  # +30: unchanged
+        ref[0, 1, 1] = 131  # +31: red
+        ref[0, 2, 2] = 69  # -31: red
+        a_path = tmp_path / "a.png"
+        b_path = tmp_path / "b.png"
+        _save_png(actual, a_path)
+        _save_png(ref, b_path)
+        out = tmp_path / "diff.png"
+
+        generate_diff_image(a_path, b_path, out)
+
+        with Image.open(out) as diff:
+            pixels = np.asarray(diff.convert("RGB"))[0].tolist()
+        assert pixels == [[100, 100, 100], [255, 0, 0], [255, 0, 0], [100, 100, 100]]
@@ -2,13 +2,30 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import io
+import struct
+import time
+import urllib.error
 import xml.etree.ElementTree as ET
+from collections import defaultdict
 from pathlib import Path
-from unittest.mock import MagicMock, patch, call
+from types import SimpleNamespace
+from unittest.mock import MagicMock
 
+import libvirt
 import pytest
 
-from vmt.vm import generate_domain_xml, _vm_dir, VMManager
+from vmt.vm import (
+    close_connection,
+    generate_domain_xml,
+    _download_image,
+    _grant_qemu_access,
+    _has_user_acl,
+    _vm_dir,
+    VMManager,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -16,10 +33,39 @@ from vmt.vm import generate_domain_xml, _vm_dir, VMManager
 # ---------------------------------------------------------------------------
 
 
+_DomainIndex = dict[str, list[ET.Element]]
+
+
+def _index_tree(root: ET.Element) -> _DomainIndex:
+    """Map every element's slash path below root (e.g. "os/type") to its elements."""
+    index: _DomainIndex = defaultdict(list)
+
+    def _walk(elem: ET.Element, prefix: str) -> None:
+        for child in elem:
+            path = f"{prefix}{child.tag}"
+            index[path].append(child)
+            _walk(child, f"{path}/")
+
+    _walk(root, "")
+    return dict(index)
+
+
+@functools.lru_cache(maxsize=None)
+def _parsed_domain(
+    items: tuple[tuple[str, object], ...],
+) -> tuple[ET.Element, _DomainIndex]:
+    """Generate, parse and index domain XML once per distinct set of arguments.
+
+    Callers share the returned tree and must treat it as read-only.
+    """
+    root = ET.fromstring(generate_domain_xml(**dict(items)))
+    return root, _index_tree(root)
+
+
 class TestGenerateDomainXml:
     """Tests for generate_domain_xml()."""
 
-    def _parse(self, **kwargs) -> ET.Element:
+    def _parse(self, **kwargs) -> tuple[ET.Element, _DomainIndex]:
         defaults = dict(
             name="testvm",
             memory_mb=2048,
@@ -28,8 +74,15 @@ class TestGenerateDomainXml:
             cloud_init_iso="/var/lib/vmt/seed.iso",
         )
         defaults.update(kwargs)
-        xml_str = generate_domain_xml(**defaults)
-        return ET.fromstring(xml_str)
+        return _parsed_domain(tuple(sorted(defaults.items())))
+
+    def _findall(self, path: str, **kwargs) -> list[ET.Element]:
+        _root, index = self._parse(**kwargs)
+        return index.get(path, [])
+
+    def _find(self, path: str, **kwargs) -> ET.Element | None:
+        found = self._findall(path, **kwargs)
+        return found[0] if found else None
 
     def test_valid_xml(self):
         """Output should be parseable XML."""
@@ -45,56 +98,43 @@ class TestGenerateDomainXml:
 
     def test_domain_name_prefix(self):
         """Domain name should be vmt-{name}."""
-        root = self._parse(name="myvm")
-        assert root.find("name").text == "vmt-myvm"
+        assert self._find("name", name="myvm").text == "vmt-myvm"
 
     def test_kvm_type(self):
         """Domain type should be kvm."""
-        root = self._parse()
+        root, _index = self._parse()
         assert root.get("type") == "kvm"
 
     def test_memory_in_kib(self):
         """Memory should be in KiB (memory_mb * 1024)."""
-        root = self._parse(memory_mb=4096)
-        mem = root.find("memory")
+        mem = self._find("memory", memory_mb=4096)
         assert mem.text == str(4096 * 1024)
         assert mem.get("unit") == "KiB"
 
     def test_vcpu_count(self):
         """vcpu element should match cpus parameter."""
-        root = self._parse(cpus=4)
-        assert root.find("vcpu").text == "4"
+        assert self._find("vcpu", cpus=4).text == "4"
 
     def test_os_type_hvm(self):
         """OS type should be hvm."""
-        root = self._parse()
-        os_type = root.find("os/type")
-        assert os_type.text == "hvm"
+        assert self._find("os/type").text == "hvm"
 
     def test_os_machine_q35(self):
         """Machine type should be q35."""
-        root = self._parse()
-        os_type = root.find("os/type")
-        assert os_type.get("machine") == "q35"
+        assert self._find("os/type").get("machine") == "q35"
 
     def test_boot_from_hd(self):
         """Boot device should be hd."""
-        root = self._parse()
-        boot = root.find("os/boot")
-        assert boot.get("dev") == "hd"
+        assert self._find("os/boot").get("dev") == "hd"
 
     def test_features_acpi_apic(self):
         """Features should include acpi and apic."""
-        root = self._parse()
-        features = root.find("features")
-        assert features.find("acpi") is not None
-        assert features.find("apic") is not None
+        assert self._find("features/acpi") is not None
+        assert self._find("features/apic") is not None
 
     def test_virtio_disk(self):
         """Should have a virtio disk at vda."""
-        root = self._parse(disk_path="/my/disk.qcow2")
-        devices = root.find("devices")
-        disks = devices.findall("disk")
+        disks = self._findall("devices/disk", disk_path="/my/disk.qcow2")
         virtio_disk = None
         for d in disks:
             target = d.find("target")
@@ -108,9 +148,7 @@ class TestGenerateDomainXml:
 
     def test_sata_cdrom(self):
         """Should have a SATA cdrom for cloud-init ISO (readonly)."""
-        root = self._parse(cloud_init_iso="/my/seed.iso")
-        devices = root.find("devices")
-        disks = devices.findall("disk")
+        disks = self._findall("devices/disk", cloud_init_iso="/my/seed.iso")
         cdrom = None
         for d in disks:
             if d.get("device") == "cdrom":
@@ -123,9 +161,7 @@ class TestGenerateDomainXml:
 
     def test_spice_graphics(self):
         """Should have SPICE graphics with autoport."""
-        root = self._parse()
-        devices = root.find("devices")
-        graphics = devices.find("graphics")
+        graphics = self._find("devices/graphics")
         assert graphics is not None
         assert graphics.get("type") == "spice"
         assert graphics.get("autoport") == "yes"
@@ -133,9 +169,7 @@ class TestGenerateDomainXml:
 
     def test_virtio_network(self):
         """Should have a virtio network interface on 'default'."""
-        root = self._parse()
-        devices = root.find("devices")
-        iface = devices.find("interface")
+        iface = self._find("devices/interface")
         assert iface is not None
         assert iface.get("type") == "network"
         assert iface.find("source").get("network") == "default"
@@ -143,21 +177,34 @@ class TestGenerateDomainXml:
 
     def test_serial_console(self):
         """Should have a serial console."""
-        root = self._parse()
-        devices = root.find("devices")
-        serial = devices.find("serial")
-        assert serial is not None
+        assert self._find("devices/serial") is not None
 
     def test_spicevmc_channel(self):
         """Should have a spicevmc channel."""
-        root = self._parse()
-        devices = root.find("devices")
-        channels = devices.findall("channel")
         spice_channels = [
-            c for c in channels if c.get("type") == "spicevmc"
+            c for c in self._findall("devices/channel")
+            if c.get("type") == "spicevmc"
         ]
         assert len(spice_channels) >= 1
 
+    def test_escapes_xml_metacharacters(self):
+        """Names and paths with <, & and quotes survive a round trip."""
+        root, _index = self._parse(
+            name="a<b&c", disk_path="/tmp/it's \"here\".qcow2"
+        )
+        assert root.find("name").text == "vmt-a<b&c"
+        disk = root.find("devices/disk[@device='disk']/source")
+        assert disk.get("file") == "/tmp/it's \"here\".qcow2"
+
+    def test_calls_do_not_share_state(self):
+        """Each call starts from a clean copy of the template."""
+        generate_domain_xml("one", 1024, 1, "/one.qcow2", "/one.iso")
+        root = ET.fromstring(
+            generate_domain_xml("two", 2048, 2, "/two.qcow2", "/two.iso")
+        )
+        assert root.find("name").text == "vmt-two"
+        assert "/one" not in ET.tostring(root, encoding="unicode")
+
 
 # ---------------------------------------------------------------------------
 # _vm_dir
@@ -167,27 +214,394 @@ class TestGenerateDomainXml:
 class TestVmDir:
     """Tests for _vm_dir()."""
 
-    @patch("vmt.vm.Path.home")
-    def test_path_contains_vmt_and_name(self, mock_home, tmp_path):
-        mock_home.return_value = tmp_path
+    @pytest.fixture(autouse=True)
+    def fake_home(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("vmt.vm.Path.home", lambda: tmp_path)
+
+    def test_path_contains_vmt_and_name(self):
         result = _vm_dir("myvm")
         assert "vmt" in str(result)
         assert "myvm" in str(result)
 
-    @patch("vmt.vm.Path.home")
-    def test_creates_directory(self, mock_home, tmp_path):
-        mock_home.return_value = tmp_path
+    def test_creates_directory(self):
         result = _vm_dir("newvm")
         assert result.is_dir()
 
-    @patch("vmt.vm.Path.home")
-    def test_path_structure(self, mock_home, tmp_path):
-        mock_home.return_value = tmp_path
+    def test_path_structure(self, tmp_path):
         result = _vm_dir("testvm")
         expected = tmp_path / ".cache" / "vmt" / "vms" / "testvm"
         assert result == expected
 
 
+# ---------------------------------------------------------------------------
+# _grant_qemu_access
+# ---------------------------------------------------------------------------
+
+
+_QEMU_UID = 64055
+
+
+def _acl_xattr(*entries: tuple[int, int, int]) -> bytes:
+    """Encode (tag, perm, id) entries as a system.posix_acl_access value."""
+    return struct.pack("<I", 2) + b"".join(
+        struct.pack("<HHI", *entry) for entry in entries
+    )
+
+
+class TestHasUserAcl:
+    """Tests for _has_user_acl()."""
+
+    def _check(self, monkeypatch, raw: bytes, perm: str) -> bool:
+        monkeypatch.setattr("vmt.vm.os.getxattr", lambda path, name: raw)
+        return _has_user_acl(Path("/d"), _QEMU_UID, perm)
+
+    def test_matching_entry(self, monkeypatch):
+        raw = _acl_xattr((0x01, 7, 0xFFFFFFFF), (0x02, 5, _QEMU_UID))
+        assert self._check(monkeypatch, raw, "rx")
+
+    def test_insufficient_perm(self, monkeypatch):
+        raw = _acl_xattr((0x02, 1, _QEMU_UID))
+        assert not self._check(monkeypatch, raw, "rx")
+
+    def test_other_user(self, monkeypatch):
+        raw = _acl_xattr((0x02, 5, 1000))
+        assert not self._check(monkeypatch, raw, "x")
+
+    def test_no_acl(self, monkeypatch):
+        def no_xattr(path, name):
+            raise OSError(61, "No data available")
+
+        monkeypatch.setattr("vmt.vm.os.getxattr", no_xattr)
+        assert not _has_user_acl(Path("/d"), _QEMU_UID, "x")
+
+
+class TestGrantQemuAccess:
+    """Tests for _grant_qemu_access()."""
+
+    @pytest.fixture
+    def mock_run(self, monkeypatch):
+        mock = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock)
+        monkeypatch.setattr("vmt.vm._qemu_uid", lambda: _QEMU_UID)
+        return mock
+
+    @pytest.fixture
+    def private_dir(self, tmp_path):
+        target = tmp_path / "vm"
+        target.mkdir(mode=0o700)
+        return target
+
+    def test_skips_setfacl_when_acl_present(self, mock_run, private_dir, monkeypatch):
+        raw = _acl_xattr((0x02, 5, _QEMU_UID))
+        monkeypatch.setattr("vmt.vm.os.getxattr", lambda path, name: raw)
+        _grant_qemu_access(private_dir)
+        mock_run.assert_not_called()
+
+    def test_batches_ancestors_into_one_call(self, mock_run, private_dir, monkeypatch):
+        def no_xattr(path, name):
+            raise OSError(61, "No data available")
+
+        monkeypatch.setattr("vmt.vm.os.getxattr", no_xattr)
+        inner = private_dir / "a" / "b"
+        inner.mkdir(parents=True, mode=0o700)
+        inner.chmod(0o700)
+        (private_dir / "a").chmod(0o700)
+        _grant_qemu_access(inner)
+
+        assert mock_run.call_count == 2
+        x_cmd, rx_cmd = (c.args[0] for c in mock_run.call_args_list)
+        assert x_cmd[:3] == ["setfacl", "-m", "u:libvirt-qemu:x"]
+        assert str(private_dir.resolve()) in x_cmd
+        assert str((private_dir / "a").resolve()) in x_cmd
+        assert rx_cmd == ["setfacl", "-m", "u:libvirt-qemu:rx", str(inner.resolve())]
+
+    def test_runs_setfacl_when_acl_missing(self, mock_run, private_dir, monkeypatch):
+        def no_xattr(path, name):
+            raise OSError(61, "No data available")
+
+        monkeypatch.setattr("vmt.vm.os.getxattr", no_xattr)
+        _grant_qemu_access(private_dir)
+        last_cmd = mock_run.call_args.args[0]
+        assert last_cmd == [
+            "setfacl", "-m", "u:libvirt-qemu:rx", str(private_dir.resolve()),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# _download_image
+# ---------------------------------------------------------------------------
+
+
+class _FakeResponse(io.BytesIO):
+    def __init__(
+        self, body: bytes, status: int = 200, headers: dict | None = None
+    ):
+        super().__init__(body)
+        self.status = status
+        self.headers = headers or {}
+
+
+class TestDownloadImage:
+    """Tests for _download_image()."""
+
+    @pytest.fixture
+    def urlopen(self, monkeypatch):
+        mock = MagicMock()
+        monkeypatch.setattr("vmt.vm.urllib.request.urlopen", mock)
+        return mock
+
+    def test_fresh_download(self, urlopen, tmp_path):
+        urlopen.return_value = _FakeResponse(b"image-bytes")
+        dest = tmp_path / "base.qcow2"
+        _download_image("http://x/img", dest)
+
+        assert dest.read_bytes() == b"image-bytes"
+        assert not (tmp_path / "base.qcow2.partial").exists()
+        request = urlopen.call_args.args[0]
+        assert request.get_header("Range") is None
+
+    def test_resumes_partial(self, urlopen, tmp_path):
+        (tmp_path / "base.qcow2.partial").write_bytes(b"image-")
+        (tmp_path / "base.qcow2.partial.validator").write_text('"v1"')
+        urlopen.return_value = _FakeResponse(b"bytes", status=206)
+        dest = tmp_path / "base.qcow2"
+        _download_image("http://x/img", dest)
+
+        assert dest.read_bytes() == b"image-bytes"
+        assert not (tmp_path / "base.qcow2.partial.validator").exists()
+        request = urlopen.call_args.args[0]
+        assert request.get_header("Range") == "bytes=6-"
+        assert request.get_header("If-range") == '"v1"'
+
+    def test_restarts_when_remote_changed(self, urlopen, tmp_path):
+        # If-Range didn't match, so the server sent the new file whole
+        (tmp_path / "base.qcow2.partial").write_bytes(b"stale")
+        (tmp_path / "base.qcow2.partial.validator").write_text('"old"')
+        urlopen.return_value = _FakeResponse(b"image-bytes", status=200)
+        dest = tmp_path / "base.qcow2"
+        _download_image("http://x/img", dest)
+        assert dest.read_bytes() == b"image-bytes"
+
+    def test_discards_partial_without_validator(self, urlopen, tmp_path):
+        (tmp_path / "base.qcow2.partial").write_bytes(b"stale")
+        urlopen.return_value = _FakeResponse(b"image-bytes")
+        dest = tmp_path / "base.qcow2"
+        _download_image("http://x/img", dest)
+
+        assert dest.read_bytes() == b"image-bytes"
+        assert urlopen.call_args.args[0].get_header("Range") is None
+
+    @pytest.mark.parametrize(
+        "headers, expected",
+        [
+            ({"ETag": '"abc"', "Last-Modified": "Mon"}, '"abc"'),
+            ({"ETag": 'W/"abc"', "Last-Modified": "Mon"}, "Mon"),
+            ({}, None),
+        ],
+    )
+    def test_interrupted_download_keeps_validator(
+        self, urlopen, tmp_path, headers, expected
+    ):
+        resp = _FakeResponse(b"", headers=headers)
+        resp.read = MagicMock(side_effect=[b"image-", ConnectionResetError()])
+        urlopen.return_value = resp
+        with pytest.raises(ConnectionResetError):
+            _download_image("http://x/img", tmp_path / "base.qcow2")
+
+        assert (tmp_path / "base.qcow2.partial").read_bytes() == b"image-"
+        validator = tmp_path / "base.qcow2.partial.validator"
+        assert (validator.read_text() if validator.exists() else None) == expected
+
+    def test_complete_partial_on_416(self, urlopen, tmp_path):
+        (tmp_path / "base.qcow2.partial").write_bytes(b"image-bytes")
+        (tmp_path / "base.qcow2.partial.validator").write_text('"v1"')
+        urlopen.side_effect = urllib.error.HTTPError(
+            "http://x/img", 416, "Range Not Satisfiable", {}, None
+        )
+        dest = tmp_path / "base.qcow2"
+        _download_image("http://x/img", dest)
+        assert dest.read_bytes() == b"image-bytes"
+
+    def test_sha256_match(self, urlopen, tmp_path):
+        urlopen.return_value = _FakeResponse(b"image-bytes")
+        dest = tmp_path / "base.qcow2"
+        _download_image(
+            "http://x/img", dest, hashlib.sha256(b"image-bytes").hexdigest()
+        )
+        assert dest.exists()
+
+    def test_sha256_mismatch_discards_file(self, urlopen, tmp_path):
+        urlopen.return_value = _FakeResponse(b"corrupt")
+        dest = tmp_path / "base.qcow2"
+        with pytest.raises(ValueError, match="SHA256 mismatch"):
+            _download_image("http://x/img", dest, "0" * 64)
+        assert not dest.exists()
+        assert not (tmp_path / "base.qcow2.partial").exists()
+
+
+# ---------------------------------------------------------------------------
+# VMManager fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def libvirt_open(monkeypatch):
+    """Replace libvirt.open with a mock returning a mock connection."""
+    mock_open = MagicMock(side_effect=lambda uri: MagicMock())
+    monkeypatch.setattr("vmt.vm.libvirt.open", mock_open)
+    monkeypatch.setattr("vmt.vm._shared_conn", None)
+    return mock_open
+
+
+@pytest.fixture
+def vm_mgr(libvirt_open):
+    """A VMManager on a mocked libvirt connection, closed on teardown."""
+    mgr = VMManager()
+    yield mgr
+    mgr.close()
+
+
+# ---------------------------------------------------------------------------
+# _ensure_base_image
+# ---------------------------------------------------------------------------
+
+
+class TestEnsureBaseImage:
+    """Tests for VMManager._ensure_base_image()."""
+
+    @pytest.fixture(autouse=True)
+    def mock_run(self, monkeypatch):
+        mock = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock)
+        return mock
+
+    @pytest.fixture
+    def images_dir(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("vmt.vm._IMAGES_DIR", tmp_path / "images")
+        return tmp_path / "images"
+
+    def test_creates_master_overlay(self, vm_mgr, images_dir, mock_run, monkeypatch):
+        monkeypatch.setattr("vmt.vm._download_image", MagicMock())
+        base = vm_mgr._ensure_base_image("http://x/img.qcow2", None)
+        cmd = mock_run.call_args.args[0]
+        assert cmd[:2] == ["qemu-img", "create"]
+        assert cmd[-1] == str(images_dir / "img.qcow2.overlay")
+        assert str(base) in cmd
+
+    def test_keeps_existing_master_overlay(self, vm_mgr, images_dir, mock_run):
+        images_dir.mkdir()
+        (images_dir / "img.qcow2").write_bytes(b"cached")
+        (images_dir / "img.qcow2.overlay").write_bytes(b"master")
+        vm_mgr._ensure_base_image("http://x/img.qcow2", None)
+        mock_run.assert_not_called()
+
+    def test_downloads_missing_image(self, vm_mgr, images_dir, monkeypatch):
+        mock_download = MagicMock()
+        monkeypatch.setattr("vmt.vm._download_image", mock_download)
+        path = vm_mgr._ensure_base_image("http://x/img.qcow2", "abc")
+        assert path == images_dir / "img.qcow2"
+        mock_download.assert_called_once_with("http://x/img.qcow2", path, "abc")
+
+    def test_uses_cached_image(self, vm_mgr, images_dir, monkeypatch):
+        images_dir.mkdir()
+        (images_dir / "img.qcow2").write_bytes(b"cached")
+        mock_download = MagicMock()
+        monkeypatch.setattr("vmt.vm._download_image", mock_download)
+        assert vm_mgr._ensure_base_image("http://x/img.qcow2", None) == (
+            images_dir / "img.qcow2"
+        )
+        mock_download.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# _get_ip
+# ---------------------------------------------------------------------------
+
+
+class TestGetIp:
+    """Tests for VMManager._get_ip()."""
+
+    def _dom(self, mac: str = "52:54:00:AA:BB:CC", uuid: str = "u1") -> MagicMock:
+        dom = MagicMock()
+        dom.UUIDString.return_value = uuid
+        dom.XMLDesc.return_value = (
+            "<domain><devices><interface type='network'>"
+            f"<mac address='{mac}'/><source network='default'/>"
+            "</interface></devices></domain>"
+        )
+        return dom
+
+    def _leases(self, vm_mgr, *leases: dict) -> MagicMock:
+        network = vm_mgr._conn.networkLookupByName.return_value
+        network.DHCPLeases.return_value = list(leases)
+        return network
+
+    def test_matches_lease_by_mac(self, vm_mgr):
+        ipv4 = libvirt.VIR_IP_ADDR_TYPE_IPV4
+        self._leases(
+            vm_mgr,
+            {"mac": "52:54:00:11:22:33", "ipaddr": "10.0.0.9", "type": ipv4},
+            {"mac": "52:54:00:aa:bb:cc", "ipaddr": "10.0.0.5", "type": ipv4},
+        )
+        assert vm_mgr._get_ip(self._dom()) == "10.0.0.5"
+        vm_mgr._conn.networkLookupByName.assert_called_with("default")
+
+    def test_no_lease_yet(self, vm_mgr):
+        self._leases(vm_mgr)
+        assert vm_mgr._get_ip(self._dom()) is None
+
+    def test_leases_shared_within_ttl(self, vm_mgr):
+        network = self._leases(vm_mgr)
+        vm_mgr._get_ip(self._dom(uuid="u1"))
+        vm_mgr._get_ip(self._dom(uuid="u2"))
+        network.DHCPLeases.assert_called_once()
+
+    def test_leases_refetched_after_ttl(self, vm_mgr, monkeypatch):
+        monkeypatch.setattr("vmt.vm._LEASE_TTL", 0)
+        network = self._leases(vm_mgr)
+        vm_mgr._get_ip(self._dom())
+        vm_mgr._get_ip(self._dom())
+        assert network.DHCPLeases.call_count == 2
+
+    def test_mac_cached_per_uuid(self, vm_mgr):
+        self._leases(vm_mgr)
+        dom = self._dom()
+        vm_mgr._get_ip(dom)
+        vm_mgr._get_ip(dom)
+        dom.XMLDesc.assert_called_once()
+
+    def test_falls_back_to_domain_leases(self, vm_mgr):
+        vm_mgr._conn.networkLookupByName.side_effect = libvirt.libvirtError("x")
+        dom = self._dom()
+        dom.interfaceAddresses.return_value = {
+            "vnet0": {"addrs": [
+                {"type": libvirt.VIR_IP_ADDR_TYPE_IPV4, "addr": "10.0.0.7"},
+            ]},
+        }
+        assert vm_mgr._get_ip(dom) == "10.0.0.7"
+
+
+# ---------------------------------------------------------------------------
+# _wait_for_ip
+# ---------------------------------------------------------------------------
+
+
+class TestWaitForIp:
+    """Tests for VMManager._wait_for_ip()."""
+
+    def test_polls_until_lease(self, vm_mgr, monkeypatch):
+        monkeypatch.setattr("vmt.vm._IP_POLL_INTERVAL", 0.01)
+        results = iter([None, None, "10.0.0.5"])
+        monkeypatch.setattr(vm_mgr, "_get_ip", lambda dom: next(results))
+        assert vm_mgr._wait_for_ip(MagicMock()) == "10.0.0.5"
+
+    def test_timeout(self, vm_mgr, monkeypatch):
+        monkeypatch.setattr("vmt.vm._IP_POLL_INTERVAL", 0.01)
+        monkeypatch.setattr(vm_mgr, "_get_ip", lambda dom: None)
+        with pytest.raises(TimeoutError, match="No IP address"):
+            vm_mgr._wait_for_ip(MagicMock(), timeout=0.05)
+
+
 # ---------------------------------------------------------------------------
 # _create_overlay_disk
 # ---------------------------------------------------------------------------
@@ -196,13 +610,45 @@ class TestVmDir:
 class TestCreateOverlayDisk:
     """Tests for VMManager._create_overlay_disk()."""
 
-    @patch("vmt.vm.subprocess.run")
-    @patch("vmt.vm.libvirt.open", return_value=MagicMock())
-    def test_calls_qemu_img(self, mock_libvirt_open, mock_run):
-        mgr = VMManager()
+    def test_replaces_existing_overlay(self, vm_mgr, monkeypatch, tmp_path):
+        mock_run = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock_run)
+        base = tmp_path / "base.qcow2"
+        overlay = tmp_path / "disk.qcow2"
+        # Left over from a previous run
+        overlay.write_bytes(b"QFI\xfb")
+        vm_mgr._create_overlay_disk(base, overlay)
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0][-1] == str(overlay)
+
+    def test_clones_master_overlay(self, vm_mgr, monkeypatch, tmp_path):
+        mock_run = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock_run)
+        monkeypatch.setattr("vmt.vm.fcntl.ioctl", MagicMock())
+        base = tmp_path / "base.qcow2"
+        (tmp_path / "base.qcow2.overlay").write_bytes(b"QFI\xfb")
+        vm_mgr._create_overlay_disk(base, tmp_path / "disk.qcow2")
+        mock_run.assert_not_called()
+
+    def test_falls_back_when_reflink_unsupported(self, vm_mgr, monkeypatch, tmp_path):
+        mock_run = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock_run)
+        ioctl = MagicMock(side_effect=OSError(95, "Operation not supported"))
+        monkeypatch.setattr("vmt.vm.fcntl.ioctl", ioctl)
+        base = tmp_path / "base.qcow2"
+        (tmp_path / "base.qcow2.overlay").write_bytes(b"QFI\xfb")
+        overlay = tmp_path / "disk.qcow2"
+        vm_mgr._create_overlay_disk(base, overlay)
+        ioctl.assert_called_once()
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0][-1] == str(overlay)
+
+    def test_calls_qemu_img(self, vm_mgr, monkeypatch):
+        mock_run = MagicMock()
+        monkeypatch.setattr("vmt.vm.subprocess.run", mock_run)
         base = Path("/images/base.qcow2")
         overlay = Path("/vms/test/disk.qcow2")
-        mgr._create_overlay_disk(base, overlay)
+        vm_mgr._create_overlay_disk(base, overlay)
 
         mock_run.assert_called_once_with(
             [
@@ -215,7 +661,155 @@ class TestCreateOverlayDisk:
             check=True,
             capture_output=True,
         )
-        mgr.close()
+
+
+# ---------------------------------------------------------------------------
+# _get_spice_port
+# ---------------------------------------------------------------------------
+
+
+class TestGetSpicePort:
+    """Tests for VMManager._get_spice_port()."""
+
+    def _port(self, vm_mgr, graphics: str) -> int | None:
+        dom = MagicMock()
+        dom.XMLDesc.return_value = (
+            f"<domain><devices>{graphics}<video/></devices></domain>"
+        )
+        return vm_mgr._get_spice_port(dom)
+
+    def test_live_port(self, vm_mgr):
+        graphics = "<graphics type='spice' port='5901' autoport='yes'/>"
+        assert self._port(vm_mgr, graphics) == 5901
+
+    def test_unassigned_port(self, vm_mgr):
+        graphics = "<graphics type='spice' port='-1' autoport='yes'/>"
+        assert self._port(vm_mgr, graphics) is None
+
+    def test_skips_non_spice_graphics(self, vm_mgr):
+        graphics = (
+            "<graphics type='vnc' port='5900'/>"
+            "<graphics type='spice' port='5902'/>"
+        )
+        assert self._port(vm_mgr, graphics) == 5902
+
+    def test_no_graphics(self, vm_mgr):
+        assert self._port(vm_mgr, "") is None
+
+
+# ---------------------------------------------------------------------------
+# get_info
+# ---------------------------------------------------------------------------
+
+
+class TestGetInfo:
+    """Tests for VMManager.get_info()."""
+
+    @pytest.fixture
+    def running_vm(self, vm_mgr, monkeypatch):
+        dom = vm_mgr._conn.lookupByName.return_value
+        dom.state.return_value = (libvirt.VIR_DOMAIN_RUNNING, 1)
+        monkeypatch.setattr(vm_mgr, "_get_ip", lambda dom: "10.0.0.5")
+        monkeypatch.setattr(vm_mgr, "_get_spice_port", lambda dom: 5901)
+        return dom
+
+    @pytest.fixture
+    def manifest_loads(self, monkeypatch):
+        find = MagicMock(return_value=Path("/m/arch-sway.toml"))
+        load = MagicMock(return_value={"ssh": {"user": "arch", "port": 2222}})
+        monkeypatch.setattr("vmt.vm.find_manifest", find)
+        monkeypatch.setattr("vmt.vm.load_vm_manifest", load)
+        return load
+
+    def test_uses_manifest_cached_by_up(self, vm_mgr, running_vm, manifest_loads):
+        vm_mgr._manifest_cache["arch-sway"] = {"ssh": {"user": "alarm"}}
+        info = vm_mgr.get_info("arch-sway")
+        assert info["ssh_user"] == "alarm"
+        assert info["ssh_port"] == 22
+        manifest_loads.assert_not_called()
+
+    def test_loads_manifest_once(self, vm_mgr, running_vm, manifest_loads):
+        first = vm_mgr.get_info("arch-sway")
+        second = vm_mgr.get_info("arch-sway")
+        assert first == second
+        assert first["ssh_user"] == "arch"
+        assert first["ssh_port"] == 2222
+        manifest_loads.assert_called_once()
+
+    def test_missing_manifest_defaults(self, vm_mgr, running_vm, monkeypatch):
+        monkeypatch.setattr(
+            "vmt.vm.find_manifest", MagicMock(side_effect=FileNotFoundError)
+        )
+        info = vm_mgr.get_info("arch-sway")
+        assert (info["ssh_user"], info["ssh_port"]) == ("root", 22)
+
+
+# ---------------------------------------------------------------------------
+# up: concurrent image download and seed ISO build
+# ---------------------------------------------------------------------------
+
+
+class TestUpPreparation:
+    """Tests for error handling around up()'s concurrent steps 2-4."""
+
+    MANIFEST = {
+        "vm": {
+            "name": "arch-sway", "image": "http://x/img.qcow2",
+            "memory": 2048, "cpus": 2, "disk": 10,
+        },
+        "provision": {"env": {}},
+        "ssh": {"user": "arch"},
+    }
+
+    @pytest.fixture
+    def env(self, vm_mgr, monkeypatch, tmp_path):
+        """Patch everything up() touches before defineXML; return the mocks."""
+        images = tmp_path / "images"
+        workdir = tmp_path / "vm"
+        workdir.mkdir()
+        mocks = SimpleNamespace(
+            images=images,
+            run=MagicMock(),
+            urlopen=MagicMock(),
+            iso=MagicMock(),
+        )
+        monkeypatch.setattr("vmt.vm._IMAGES_DIR", images)
+        monkeypatch.setattr("vmt.vm._vm_dir", lambda name: workdir)
+        monkeypatch.setattr("vmt.vm.find_manifest", MagicMock())
+        monkeypatch.setattr(
+            "vmt.vm.load_vm_manifest", MagicMock(return_value=self.MANIFEST)
+        )
+        monkeypatch.setattr("vmt.vm.get_ssh_pubkey", lambda: "ssh-ed25519 AAAA")
+        monkeypatch.setattr("vmt.vm.generate_user_data", MagicMock(return_value=""))
+        monkeypatch.setattr("vmt.vm.generate_meta_data", MagicMock(return_value=""))
+        monkeypatch.setattr("vmt.vm.subprocess.run", mocks.run)
+        monkeypatch.setattr("vmt.vm.urllib.request.urlopen", mocks.urlopen)
+        monkeypatch.setattr("vmt.vm.create_cloud_init_iso", mocks.iso)
+        return mocks
+
+    def test_download_error_surfaces(self, vm_mgr, env):
+        env.urlopen.side_effect = urllib.error.URLError("unreachable")
+        with pytest.raises(urllib.error.URLError):
+            vm_mgr.up("arch-sway")
+
+        env.iso.assert_called_once()  # the other future still finished
+        env.run.assert_not_called()  # no overlay without an image
+        vm_mgr._conn.defineXML.assert_not_called()
+
+    def test_iso_error_surfaces_after_download_completes(self, vm_mgr, env):
+        def slow_response(request):
+            time.sleep(0.05)
+            return _FakeResponse(b"image-bytes")
+
+        env.urlopen.side_effect = slow_response
+        env.iso.side_effect = OSError("disk full")
+        with pytest.raises(OSError, match="disk full"):
+            vm_mgr.up("arch-sway")
+
+        # The download was awaited, not abandoned half-written
+        assert (env.images / "img.qcow2").read_bytes() == b"image-bytes"
+        assert not (env.images / "img.qcow2.partial").exists()
+        vm_mgr._conn.defineXML.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -226,32 +820,46 @@ class TestCreateOverlayDisk:
 class TestVMManagerConstructor:
     """Tests for VMManager.__init__()."""
 
-    @patch("vmt.vm.libvirt.open", return_value=MagicMock())
-    def test_connects_to_qemu_system(self, mock_open):
-        mgr = VMManager()
-        mock_open.assert_called_once_with("qemu:///system")
-        mgr.close()
+    def test_connects_to_qemu_system(self, vm_mgr, libvirt_open):
+        libvirt_open.assert_called_once_with("qemu:///system")
 
-    @patch("vmt.vm.libvirt.open", return_value=MagicMock())
-    def test_default_manifest_dirs(self, mock_open):
-        mgr = VMManager()
+    def test_default_manifest_dirs(self, vm_mgr):
         # Should have at least one directory in manifest_dirs
-        assert len(mgr.manifest_dirs) >= 1
+        assert len(vm_mgr.manifest_dirs) >= 1
         # The default should point to the package's manifests dir
-        assert mgr.manifest_dirs[0].name == "manifests"
-        mgr.close()
+        assert vm_mgr.manifest_dirs[0].name == "manifests"
 
-    @patch("vmt.vm.libvirt.open", return_value=MagicMock())
-    def test_custom_manifest_dirs(self, mock_open, tmp_path):
+    def test_custom_manifest_dirs(self, libvirt_open, tmp_path):
         dirs = [tmp_path / "custom"]
         mgr = VMManager(manifest_dirs=dirs)
         assert mgr.manifest_dirs == dirs
         mgr.close()
 
-    @patch("vmt.vm.libvirt.open", return_value=MagicMock())
-    def test_close_closes_connection(self, mock_open):
-        mock_conn = MagicMock()
-        mock_open.return_value = mock_conn
-        mgr = VMManager()
-        mgr.close()
-        mock_conn.close.assert_called_once()
+    def test_close_keeps_shared_connection_open(self, vm_mgr):
+        conn = vm_mgr._conn
+        vm_mgr.close()
+        conn.close.assert_not_called()
+
+    def test_managers_share_connection(self, vm_mgr, libvirt_open):
+        other = VMManager()
+        assert other._conn is vm_mgr._conn
+        libvirt_open.assert_called_once()
+        other.close()
+
+    def test_reopens_dead_connection(self, vm_mgr, libvirt_open):
+        vm_mgr._conn.isAlive.return_value = 0
+        other = VMManager()
+        assert other._conn is not vm_mgr._conn
+        assert libvirt_open.call_count == 2
+        other.close()
+
+    def test_open_failure(self, monkeypatch):
+        monkeypatch.setattr("vmt.vm.libvirt.open", MagicMock(return_value=None))
+        monkeypatch.setattr("vmt.vm._shared_conn", None)
+        with pytest.raises(RuntimeError, match="Failed to connect"):
+            VMManager()
+
+    def test_close_connection(self, vm_mgr):
+        conn = vm_mgr._conn
+        close_connection()
+        conn.close.assert_called_once()
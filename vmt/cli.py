@@ -3,15 +3,21 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import io
 import logging
 import os
+import secrets
 import subprocess
 import sys
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TextIO
 
 from vmt.connect import SSHClient
 from vmt.manifest import load_test_manifest
-from vmt.screenshot import compare_screenshots, generate_diff_image
+from vmt.screenshot import compare_screenshots_batch, generate_diff_image
 from vmt.vm import VMManager
 
 log = logging.getLogger(__name__)
@@ -22,10 +28,53 @@ log = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 
 
+_MANIFEST_DIR = Path(__file__).resolve().parent.parent / "manifests"
+
+
 def _get_manager() -> VMManager:
     """Create a VMManager with the built-in manifests directory."""
-    manifest_dir = Path(__file__).resolve().parent.parent / "manifests"
-    return VMManager(manifest_dirs=[manifest_dir])
+    return VMManager(manifest_dirs=[_MANIFEST_DIR])
+
+
+# ---------------------------------------------------------------------------
+# Remote command batching
+# ---------------------------------------------------------------------------
+
+_BATCH_MARK = "\0VMT_MARK\0"
+
+
+def _batch_script(commands: list[str]) -> str:
+    """Wrap *commands* into one ``bash -s`` invocation.
+
+    Each command runs in its own subshell with stdin from /dev/null, so
+    ``cd``/``export`` and stdin reads behave as they would in separate
+    exec channels.  A NUL-delimited marker is printed after each command
+    so the combined stdout can be split back apart.  The heredoc
+    delimiter is random per batch so no command line can end it early.
+    """
+    eof = f"VMT_EOF_{secrets.token_hex(8)}"
+    mark = "printf '{}'".format(_BATCH_MARK.replace("\0", r"\0"))
+    lines = [f"bash -s <<'{eof}'"]
+    for cmd in commands:
+        lines += ["(", cmd, ") </dev/null", mark]
+    lines.append(eof)
+    return "\n".join(lines)
+
+
+def _run_commands(client: SSHClient, commands: list[str]) -> list[str]:
+    """Run *commands* over a single SSH exec and return each one's stdout.
+
+    Commands run in order regardless of exit status, as separate
+    client.run() calls would.
+    """
+    if not commands:
+        return []
+    for cmd in commands:
+        log.debug("Running: %s", cmd)
+    result = client.run(_batch_script(commands))
+    outputs = result.stdout.split(_BATCH_MARK)[: len(commands)]
+    # A dropped connection can cut the batch short.
+    return outputs + [""] * (len(commands) - len(outputs))
 
 
 # ---------------------------------------------------------------------------
@@ -33,11 +82,11 @@ def _get_manager() -> VMManager:
 # ---------------------------------------------------------------------------
 
 
-def cmd_up(args: argparse.Namespace) -> None:
+def cmd_up(name: str) -> None:
     """Boot a VM."""
     mgr = _get_manager()
     try:
-        info = mgr.up(args.name)
+        info = mgr.up(name)
         print(f"VM '{info['name']}' is up")
         print(f"  IP:         {info['ip']}")
         print(f"  SSH:        ssh {info['ssh_user']}@{info['ip']} -p {info['ssh_port']}")
@@ -46,30 +95,30 @@ def cmd_up(args: argparse.Namespace) -> None:
         mgr.close()
 
 
-def cmd_destroy(args: argparse.Namespace) -> None:
+def cmd_destroy(name: str) -> None:
     """Tear down a VM."""
     mgr = _get_manager()
     try:
-        mgr.destroy(args.name)
-        print(f"VM '{args.name}' destroyed")
+        mgr.destroy(name)
+        print(f"VM '{name}' destroyed")
     finally:
         mgr.close()
 
 
-def cmd_ssh(args: argparse.Namespace) -> None:
+def cmd_ssh(name: str, cmd: list[str]) -> None:
     """SSH into a VM or run a command."""
     mgr = _get_manager()
     try:
-        info = mgr.get_info(args.name)
+        info = mgr.get_info(name)
         if info is None:
-            print(f"VM '{args.name}' is not running", file=sys.stderr)
+            print(f"VM '{name}' is not running", file=sys.stderr)
             sys.exit(1)
 
         ip = info["ip"]
         ssh_user = info.get("ssh_user", "root")
         ssh_port = info.get("ssh_port", 22)
 
-        if not args.cmd:
+        if not cmd:
             # Interactive SSH — replace process
             os.execvp("ssh", [
                 "ssh",
@@ -81,7 +130,7 @@ def cmd_ssh(args: argparse.Namespace) -> None:
             # Non-interactive — run command via SSHClient
             client = SSHClient(host=ip, user=ssh_user, port=ssh_port)
             try:
-                result = client.run(" ".join(args.cmd))
+                result = client.run(" ".join(cmd))
                 if result.stdout:
                     print(result.stdout, end="")
                 if result.stderr:
@@ -93,18 +142,18 @@ def cmd_ssh(args: argparse.Namespace) -> None:
         mgr.close()
 
 
-def cmd_view(args: argparse.Namespace) -> None:
+def cmd_view(name: str) -> None:
     """Open SPICE viewer for a VM."""
     mgr = _get_manager()
     try:
-        info = mgr.get_info(args.name)
+        info = mgr.get_info(name)
         if info is None:
-            print(f"VM '{args.name}' is not running", file=sys.stderr)
+            print(f"VM '{name}' is not running", file=sys.stderr)
             sys.exit(1)
 
         port = info["spice_port"]
         if port is None:
-            print(f"No SPICE port found for VM '{args.name}'", file=sys.stderr)
+            print(f"No SPICE port found for VM '{name}'", file=sys.stderr)
             sys.exit(1)
 
         subprocess.Popen(
@@ -117,103 +166,261 @@ def cmd_view(args: argparse.Namespace) -> None:
         mgr.close()
 
 
-def cmd_screenshot(args: argparse.Namespace) -> None:
+def cmd_screenshot(name: str, remote_path: str, local_path: Path) -> None:
     """SCP a file from a VM."""
     mgr = _get_manager()
     try:
-        info = mgr.get_info(args.name)
+        info = mgr.get_info(name)
         if info is None:
-            print(f"VM '{args.name}' is not running", file=sys.stderr)
+            print(f"VM '{name}' is not running", file=sys.stderr)
             sys.exit(1)
 
         ip = info["ip"]
         ssh_user = info.get("ssh_user", "root")
+        ssh_port = info.get("ssh_port", 22)
 
-        client = SSHClient(host=ip, user=ssh_user)
+        client = SSHClient(host=ip, user=ssh_user, port=ssh_port)
         try:
-            client.download(args.remote_path, Path(args.local_path))
-            print(f"Downloaded {args.remote_path} → {args.local_path}")
+            client.download(remote_path, local_path)
+            print(f"Downloaded {remote_path} → {local_path}")
         finally:
             client.close()
     finally:
         mgr.close()
 
 
-def cmd_test(args: argparse.Namespace) -> None:
-    """Run test scenarios from a test manifest."""
-    manifest_path = Path(args.manifest)
+# Parallel scenarios share one pooled transport, and each worker holds an
+# exec channel plus its own SFTP channel; 4 workers stay within OpenSSH's
+# default MaxSessions of 10.
+_MAX_SCENARIO_WORKERS = 4
+
+
+def _screenshot_path(index: int, scenario_name: str) -> Path:
+    """Local path the *index*-th scenario's screenshot is downloaded to.
+
+    The index keeps paths unique when scenarios share a name.
+    """
+    return Path(f".vmt/screenshots/{index:02d}-{scenario_name}.png")
+
+
+def _run_scenario_commands(
+    client: SSHClient, scenario: dict, out: TextIO
+) -> list[str]:
+    """Run a scenario's commands and check expect_output.
+
+    Returns:
+        Failure messages.
+    """
+    scenario_name = scenario["name"]
+    failures = []
+    print(f"--- Scenario: {scenario_name} ---", file=out)
+
+    outputs = _run_commands(client, scenario.get("commands", []))
+    for stdout in outputs:
+        if stdout:
+            print(stdout, end="", file=out)
+
+        # Check expect_output if present
+        expect = scenario.get("expect_output")
+        if expect is not None:
+            if expect not in stdout:
+                msg = (
+                    f"[{scenario_name}] Expected output '{expect}' "
+                    f"not found in: {stdout.strip()}"
+                )
+                print(f"FAIL: {msg}", file=out)
+                failures.append(msg)
+
+    return failures
+
+
+def _check_screenshots(
+    checks: list[tuple[int, dict]], manifest_dir: Path
+) -> list[tuple[str, list[str]]]:
+    """Compare downloaded screenshots against their references.
+
+    *checks* holds (index, scenario) for scenarios that took a screenshot.
+    All comparisons go through compare_screenshots_batch() together.
+
+    Returns:
+        One (output, failures) tuple per check, in input order.
+    """
+    outs = [io.StringIO() for _ in checks]
+    failures: list[list[str]] = [[] for _ in checks]
+    pending: list[tuple[int, Path, Path, float]] = []
+
+    for slot, (index, scenario) in enumerate(checks):
+        scenario_name = scenario["name"]
+        local_screenshot = _screenshot_path(index, scenario_name)
+        print(f"  Screenshot saved: {local_screenshot}", file=outs[slot])
+
+        reference = scenario.get("reference")
+        if not reference:
+            continue
+        ref_path = manifest_dir / reference
+        if not ref_path.exists():
+            msg = f"[{scenario_name}] Reference not found: {ref_path}"
+            print(f"FAIL: {msg}", file=outs[slot])
+            failures[slot].append(msg)
+            continue
+        pending.append(
+            (slot, local_screenshot, ref_path, scenario.get("threshold", 0.95))
+        )
+
+    results = compare_screenshots_batch(
+        [(local, ref) for _slot, local, ref, _t in pending],
+        threshold=[t for _slot, _local, _ref, t in pending],
+    )
+    for (slot, local, ref_path, threshold), (passed, score) in zip(pending, results):
+        index, scenario = checks[slot]
+        if passed:
+            print(f"  SSIM: {score:.4f} >= {threshold} — PASS", file=outs[slot])
+            continue
+        diff_path = Path(f".vmt/diffs/{index:02d}-{scenario['name']}-diff.png")
+        generate_diff_image(local, ref_path, diff_path)
+        msg = (
+            f"[{scenario['name']}] SSIM {score:.4f} < {threshold} "
+            f"(diff: {diff_path})"
+        )
+        print(f"FAIL: {msg}", file=outs[slot])
+        failures[slot].append(msg)
+
+    return [(out.getvalue(), f) for out, f in zip(outs, failures)]
+
+
+def _fetch_screenshot(client: SSHClient, index: int, scenario: dict) -> None:
+    """Download a scenario's screenshot, if it takes one."""
+    screenshot_remote = scenario.get("screenshot")
+    if screenshot_remote:
+        client.download(screenshot_remote, _screenshot_path(index, scenario["name"]))
+
+
+def _run_scenarios_serial(
+    client: SSHClient, scenarios: list[dict], manifest_dir: Path
+) -> list[str]:
+    """Run scenarios in order, then compare all screenshots.
+
+    Each screenshot is downloaded before the next scenario's commands run,
+    so later scenarios can't change what an earlier one captured.  Only
+    the local comparisons are deferred, and they run as one batch.
+    """
+    failures = []
+    for index, scenario in enumerate(scenarios):
+        failures += _run_scenario_commands(client, scenario, sys.stdout)
+        _fetch_screenshot(client, index, scenario)
+
+    checks = [
+        (index, scenario)
+        for index, scenario in enumerate(scenarios)
+        if scenario.get("screenshot")
+    ]
+    for output, check_failures in _check_screenshots(checks, manifest_dir):
+        print(output, end="")
+        failures += check_failures
+    return failures
+
+
+def _run_scenario_buffered(
+    host: str,
+    user: str,
+    port: int,
+    index: int,
+    scenario: dict,
+) -> tuple[str, list[str]]:
+    """Run a scenario's commands on its own SSHClient and fetch its screenshot.
+
+    Clients for the same VM share one pooled transport, so this only
+    costs a new channel per scenario.  Screenshot comparison is left to
+    the caller.
+
+    Returns:
+        (output, failures) for the commands.
+    """
+    out = io.StringIO()
+    client = SSHClient(host=host, user=user, port=port)
+    try:
+        failures = _run_scenario_commands(client, scenario, out)
+        _fetch_screenshot(client, index, scenario)
+    finally:
+        client.close()
+    return out.getvalue(), failures
+
+
+def _run_scenarios_parallel(
+    host: str, user: str, port: int, scenarios: list[dict], manifest_dir: Path
+) -> list[str]:
+    """Run scenarios concurrently, then compare all screenshots as a batch.
+
+    Each scenario's output is printed in manifest order, followed by its
+    comparison result.
+    """
+    workers = min(_MAX_SCENARIO_WORKERS, len(scenarios)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        runs = list(
+            ex.map(
+                lambda indexed: _run_scenario_buffered(
+                    host, user, port, *indexed
+                ),
+                enumerate(scenarios),
+            )
+        )
+
+    checks = [
+        (index, scenario)
+        for index, scenario in enumerate(scenarios)
+        if scenario.get("screenshot")
+    ]
+    check_results = {
+        index: result
+        for (index, _scenario), result in zip(
+            checks, _check_screenshots(checks, manifest_dir)
+        )
+    }
+
+    failures = []
+    for index, (output, run_failures) in enumerate(runs):
+        print(output, end="")
+        failures += run_failures
+        if index in check_results:
+            check_output, check_failures = check_results[index]
+            print(check_output, end="")
+            failures += check_failures
+    return failures
+
+
+def cmd_test(name: str, manifest_path: Path) -> None:
+    """Run test scenarios from a test manifest.
+
+    Scenarios run in order on one connection unless the manifest sets
+    ``parallel = true`` under [test], in which case they run concurrently.
+    Either way, screenshots are compared as one batch and output is
+    printed in manifest order.
+    """
     manifest = load_test_manifest(manifest_path)
+    scenarios = manifest["scenario"]
+    manifest_dir = manifest_path.parent
 
     mgr = _get_manager()
     try:
-        info = mgr.get_info(args.name)
+        info = mgr.get_info(name)
         if info is None:
-            print(f"VM '{args.name}' is not running", file=sys.stderr)
+            print(f"VM '{name}' is not running", file=sys.stderr)
             sys.exit(1)
 
         ip = info["ip"]
         ssh_user = info.get("ssh_user", "root")
+        ssh_port = info.get("ssh_port", 22)
 
-        client = SSHClient(host=ip, user=ssh_user)
-        failures = []
-        try:
-            for scenario in manifest["scenario"]:
-                name = scenario["name"]
-                print(f"--- Scenario: {name} ---")
-
-                # Run commands
-                for cmd in scenario.get("commands", []):
-                    log.debug("Running: %s", cmd)
-                    result = client.run(cmd)
-                    if result.stdout:
-                        print(result.stdout, end="")
-
-                    # Check expect_output if present
-                    expect = scenario.get("expect_output")
-                    if expect is not None:
-                        if expect not in result.stdout:
-                            msg = (
-                                f"[{name}] Expected output '{expect}' "
-                                f"not found in: {result.stdout.strip()}"
-                            )
-                            print(f"FAIL: {msg}")
-                            failures.append(msg)
-
-                # Take screenshot if specified
-                screenshot_remote = scenario.get("screenshot")
-                if screenshot_remote:
-                    local_screenshot = Path(f".vmt/screenshots/{name}.png")
-                    client.download(screenshot_remote, local_screenshot)
-                    print(f"  Screenshot saved: {local_screenshot}")
-
-                    # Compare against reference if specified
-                    reference = scenario.get("reference")
-                    if reference:
-                        ref_path = manifest_path.parent / reference
-                        threshold = scenario.get("threshold", 0.95)
-
-                        if not ref_path.exists():
-                            msg = f"[{name}] Reference not found: {ref_path}"
-                            print(f"FAIL: {msg}")
-                            failures.append(msg)
-                            continue
-
-                        passed, score = compare_screenshots(
-                            local_screenshot, ref_path, threshold=threshold
-                        )
-                        if passed:
-                            print(f"  SSIM: {score:.4f} >= {threshold} — PASS")
-                        else:
-                            diff_path = Path(f".vmt/diffs/{name}-diff.png")
-                            generate_diff_image(local_screenshot, ref_path, diff_path)
-                            msg = (
-                                f"[{name}] SSIM {score:.4f} < {threshold} "
-                                f"(diff: {diff_path})"
-                            )
-                            print(f"FAIL: {msg}")
-                            failures.append(msg)
-        finally:
-            client.close()
+        if manifest["test"].get("parallel", False):
+            failures = _run_scenarios_parallel(
+                ip, ssh_user, ssh_port, scenarios, manifest_dir
+            )
+        else:
+            client = SSHClient(host=ip, user=ssh_user, port=ssh_port)
+            try:
+                failures = _run_scenarios_serial(client, scenarios, manifest_dir)
+            finally:
+                client.close()
 
         if failures:
             print(f"\n{len(failures)} scenario(s) failed:")
@@ -221,32 +428,32 @@ def cmd_test(args: argparse.Namespace) -> None:
                 print(f"  - {f}")
             sys.exit(1)
         else:
-            print(f"\nAll {len(manifest['scenario'])} scenario(s) passed")
+            print(f"\nAll {len(scenarios)} scenario(s) passed")
     finally:
         mgr.close()
 
 
-def cmd_snapshot(args: argparse.Namespace) -> None:
+def cmd_snapshot(name: str, snap_name: str) -> None:
     """Create a snapshot of a VM."""
     mgr = _get_manager()
     try:
-        mgr.snapshot(args.name, args.snap_name)
-        print(f"Snapshot '{args.snap_name}' created for VM '{args.name}'")
+        mgr.snapshot(name, snap_name)
+        print(f"Snapshot '{snap_name}' created for VM '{name}'")
     finally:
         mgr.close()
 
 
-def cmd_restore(args: argparse.Namespace) -> None:
+def cmd_restore(name: str, snap_name: str) -> None:
     """Restore a VM to a snapshot."""
     mgr = _get_manager()
     try:
-        mgr.restore(args.name, args.snap_name)
-        print(f"VM '{args.name}' restored to snapshot '{args.snap_name}'")
+        mgr.restore(name, snap_name)
+        print(f"VM '{name}' restored to snapshot '{snap_name}'")
     finally:
         mgr.close()
 
 
-def cmd_update_references(args: argparse.Namespace) -> None:
+def cmd_update_references(name: str) -> None:
     """Placeholder for updating reference screenshots."""
     print("not yet implemented")
 
@@ -256,8 +463,107 @@ def cmd_update_references(args: argparse.Namespace) -> None:
 # ---------------------------------------------------------------------------
 
 
-def build_parser() -> argparse.ArgumentParser:
-    """Build and return the argument parser for vmt."""
+def _add_name(p: argparse.ArgumentParser) -> None:
+    p.add_argument("name", help="VM name")
+
+
+def _add_ssh_args(p: argparse.ArgumentParser) -> None:
+    _add_name(p)
+    p.add_argument("cmd", nargs="*", default=[], help="Command to run")
+
+
+def _add_screenshot_args(p: argparse.ArgumentParser) -> None:
+    _add_name(p)
+    p.add_argument("remote_path", help="Remote file path")
+    p.add_argument("local_path", help="Local file path")
+
+
+def _add_test_args(p: argparse.ArgumentParser) -> None:
+    _add_name(p)
+    p.add_argument("--manifest", required=True, help="Path to test manifest")
+
+
+def _add_snapshot_args(p: argparse.ArgumentParser) -> None:
+    _add_name(p)
+    p.add_argument("snap_name", help="Snapshot name")
+
+
+# name -> (help, argument builder, Namespace -> cmd_* adapter)
+_SUBCOMMANDS: dict[
+    str,
+    tuple[
+        str,
+        Callable[[argparse.ArgumentParser], None],
+        Callable[[argparse.Namespace], None],
+    ],
+] = {
+    "up": ("Boot a VM", _add_name, lambda a: cmd_up(a.name)),
+    "destroy": ("Tear down a VM", _add_name, lambda a: cmd_destroy(a.name)),
+    "ssh": (
+        "SSH into a VM or run a command",
+        _add_ssh_args,
+        lambda a: cmd_ssh(a.name, a.cmd),
+    ),
+    "view": ("Open SPICE viewer", _add_name, lambda a: cmd_view(a.name)),
+    "screenshot": (
+        "SCP a file from a VM",
+        _add_screenshot_args,
+        lambda a: cmd_screenshot(a.name, a.remote_path, Path(a.local_path)),
+    ),
+    "test": (
+        "Run test scenarios",
+        _add_test_args,
+        lambda a: cmd_test(a.name, Path(a.manifest)),
+    ),
+    "snapshot": (
+        "Create a VM snapshot",
+        _add_snapshot_args,
+        lambda a: cmd_snapshot(a.name, a.snap_name),
+    ),
+    "restore": (
+        "Restore a VM snapshot",
+        _add_snapshot_args,
+        lambda a: cmd_restore(a.name, a.snap_name),
+    ),
+    "update-references": (
+        "Update reference screenshots",
+        _add_name,
+        lambda a: cmd_update_references(a.name),
+    ),
+}
+
+
+def _requested_command(argv: list[str]) -> str | None:
+    """Return the subcommand named in argv, or None if there isn't a known one.
+
+    A top-level ``-h``/``--help`` before the subcommand also gives None, so
+    the help lists every subcommand.
+    """
+    for arg in argv:
+        if arg in ("--", "-h", "--help"):
+            break
+        if not arg.startswith("-"):
+            return arg if arg in _SUBCOMMANDS else None
+    return None
+
+
+def build_parser(command: str | None = None) -> argparse.ArgumentParser:
+    """Return the argument parser for vmt.
+
+    When *command* names a subcommand, only that subparser is registered,
+    so a normal invocation doesn't pay for building the others.  Without
+    it (or for an unknown name) every subcommand is registered, which is
+    what ``--help`` and usage errors need.
+
+    Parsers are built once per subcommand and shared; ``parse_args()``
+    doesn't modify them, but callers must not add arguments to the
+    returned parser.
+    """
+    return _build_parser(command if command in _SUBCOMMANDS else None)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_parser(command: str | None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="vmt",
         description="Visual VM testing for Wayland applications",
@@ -271,47 +577,10 @@ def build_parser() -> argparse.ArgumentParser:
 
     sub = parser.add_subparsers(dest="command")
 
-    # up
-    p_up = sub.add_parser("up", help="Boot a VM")
-    p_up.add_argument("name", help="VM name")
-
-    # destroy
-    p_destroy = sub.add_parser("destroy", help="Tear down a VM")
-    p_destroy.add_argument("name", help="VM name")
-
-    # ssh
-    p_ssh = sub.add_parser("ssh", help="SSH into a VM or run a command")
-    p_ssh.add_argument("name", help="VM name")
-    p_ssh.add_argument("cmd", nargs="*", default=[], help="Command to run")
-
-    # view
-    p_view = sub.add_parser("view", help="Open SPICE viewer")
-    p_view.add_argument("name", help="VM name")
-
-    # screenshot
-    p_screenshot = sub.add_parser("screenshot", help="SCP a file from a VM")
-    p_screenshot.add_argument("name", help="VM name")
-    p_screenshot.add_argument("remote_path", help="Remote file path")
-    p_screenshot.add_argument("local_path", help="Local file path")
-
-    # test
-    p_test = sub.add_parser("test", help="Run test scenarios")
-    p_test.add_argument("name", help="VM name")
-    p_test.add_argument("--manifest", required=True, help="Path to test manifest")
-
-    # snapshot
-    p_snapshot = sub.add_parser("snapshot", help="Create a VM snapshot")
-    p_snapshot.add_argument("name", help="VM name")
-    p_snapshot.add_argument("snap_name", help="Snapshot name")
-
-    # restore
-    p_restore = sub.add_parser("restore", help="Restore a VM snapshot")
-    p_restore.add_argument("name", help="VM name")
-    p_restore.add_argument("snap_name", help="Snapshot name")
-
-    # update-references
-    p_update = sub.add_parser("update-references", help="Update reference screenshots")
-    p_update.add_argument("name", help="VM name")
+    names = [command] if command is not None else list(_SUBCOMMANDS)
+    for name in names:
+        help_text, add_args, _handler = _SUBCOMMANDS[name]
+        add_args(sub.add_parser(name, help=help_text))
 
     return parser
 
@@ -323,29 +592,19 @@ def build_parser() -> argparse.ArgumentParser:
 
 def main(argv: list[str] | None = None) -> None:
     """Parse arguments and dispatch to the appropriate command handler."""
-    parser = build_parser()
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = build_parser(_requested_command(argv))
     args = parser.parse_args(argv)
 
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
-    dispatch = {
-        "up": cmd_up,
-        "destroy": cmd_destroy,
-        "ssh": cmd_ssh,
-        "view": cmd_view,
-        "screenshot": cmd_screenshot,
-        "test": cmd_test,
-        "snapshot": cmd_snapshot,
-        "restore": cmd_restore,
-        "update-references": cmd_update_references,
-    }
-
-    handler = dispatch.get(args.command)
-    if handler is None:
+    if args.command is None:
         parser.print_help()
         sys.exit(1)
 
+    _help, _add_args, handler = _SUBCOMMANDS[args.command]
     handler(args)
 
 
@@ -2,7 +2,14 @@
 
 from __future__ import annotations
 
+import atexit
+import codecs
+import functools
+import os
+import socket
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -12,12 +19,43 @@ import paramiko
 # ── Key discovery ─────────────────────────────────────────────────────
 
 _KEY_NAMES = ("id_ed25519", "id_rsa", "id_ecdsa")
+_PUB_SUFFIX = ".pub"
+
+
+def _home() -> Path:
+    """Home directory to search for SSH keys: $VMT_HOME, else ~."""
+    return Path(os.environ.get("VMT_HOME") or Path.home())
+
+
+@functools.lru_cache(maxsize=4)
+def _find_ssh_key(home: str) -> Path:
+    """Return the first supported private key under <home>/.ssh/."""
+    ssh_dir = os.path.join(home, ".ssh")
+    for name in _KEY_NAMES:
+        key = os.path.join(ssh_dir, name)
+        if os.path.isfile(key):
+            return Path(key)
+    raise FileNotFoundError(
+        f"No SSH private key found in {ssh_dir} "
+        f"(checked {', '.join(_KEY_NAMES)})"
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _read_pubkey(key_path: Path) -> str:
+    """Return the trimmed contents of <key_path>.pub."""
+    pub_path = key_path.with_name(key_path.name + _PUB_SUFFIX)
+    if not pub_path.exists():
+        raise FileNotFoundError(f"Public key not found: {pub_path}")
+    return pub_path.read_text().strip()
 
 
 def get_ssh_key_path() -> Path:
     """Find the first available SSH private key in ~/.ssh/.
 
-    Checks for id_ed25519, id_rsa, id_ecdsa in that order.
+    Checks for id_ed25519, id_rsa, id_ecdsa in that order.  ``$VMT_HOME``
+    overrides the home directory when set.  The result is cached per
+    home directory; failed lookups are not cached.
 
     Returns:
         Path to the private key file.
@@ -25,31 +63,126 @@ def get_ssh_key_path() -> Path:
     Raises:
         FileNotFoundError: If no supported key is found.
     """
-    ssh_dir = Path.home() / ".ssh"
-    for name in _KEY_NAMES:
-        key = ssh_dir / name
-        if key.exists():
-            return key
-    raise FileNotFoundError(
-        f"No SSH private key found in {ssh_dir} "
-        f"(checked {', '.join(_KEY_NAMES)})"
-    )
+    return _find_ssh_key(str(_home()))
 
 
 def get_ssh_pubkey() -> str:
     """Read the public key corresponding to the private key on disk.
 
+    The result is cached per private key path.
+
     Returns:
         The public key string (trimmed).
 
     Raises:
         FileNotFoundError: If the .pub file doesn't exist.
     """
-    key_path = get_ssh_key_path()
-    pub_path = key_path.with_suffix(key_path.suffix + ".pub")
-    if not pub_path.exists():
-        raise FileNotFoundError(f"Public key not found: {pub_path}")
-    return pub_path.read_text().strip()
+    return _read_pubkey(get_ssh_key_path())
+
+
+def clear_key_cache() -> None:
+    """Forget cached key lookups, e.g. after keys are added or removed."""
+    _find_ssh_key.cache_clear()
+    _read_pubkey.cache_clear()
+
+
+# ── Connection pool ───────────────────────────────────────────────────
+
+_PoolKey = tuple[str, str, int, str]
+
+_POOL_SIZE = 8
+# key -> [client, refcount]; ordered oldest-used first.  Guarded by
+# _POOL_LOCK: parallel scenarios acquire clients from worker threads.
+_POOL: OrderedDict[_PoolKey, list] = OrderedDict()
+_POOL_LOCK = threading.Lock()
+
+
+def _new_paramiko_client(key: _PoolKey) -> paramiko.SSHClient:
+    """Open and authenticate a fresh paramiko client for *key*."""
+    host, user, port, key_path = key
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(
+        hostname=host,
+        port=port,
+        username=user,
+        key_filename=key_path,
+    )
+    return client
+
+
+def _is_alive(client: paramiko.SSHClient) -> bool:
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+def _acquire(key: _PoolKey) -> paramiko.SSHClient:
+    """Hand out a live client for *key*, reusing a pooled one if possible.
+
+    The lookup and any new connection happen under the pool lock, so
+    concurrent callers for the same key share one transport.
+    """
+    with _POOL_LOCK:
+        entry = _POOL.get(key)
+        if entry is not None and not _is_alive(entry[0]):
+            entry[0].close()
+            del _POOL[key]
+            entry = None
+        if entry is None:
+            entry = _POOL[key] = [_new_paramiko_client(key), 0]
+        entry[1] += 1
+        _POOL.move_to_end(key)
+        _evict()
+        return entry[0]
+
+
+def _release(key: _PoolKey) -> None:
+    """Drop one reference to the pooled client for *key*."""
+    with _POOL_LOCK:
+        entry = _POOL.get(key)
+        if entry is not None and entry[1] > 0:
+            entry[1] -= 1
+        _evict()
+
+
+def _evict() -> None:
+    """Close least recently used idle clients while the pool is over size.
+
+    Caller must hold _POOL_LOCK.
+    """
+    excess = len(_POOL) - _POOL_SIZE
+    if excess <= 0:
+        return
+    idle = [key for key, (_client, refs) in _POOL.items() if refs == 0]
+    for key in idle[:excess]:
+        _POOL.pop(key)[0].close()
+
+
+def close_pool() -> None:
+    """Close every pooled SSH connection, in use or not."""
+    with _POOL_LOCK:
+        while _POOL:
+            _key, (client, _refs) = _POOL.popitem(last=False)
+            client.close()
+
+
+# Pooled transports outlive SSHClient.close(); shut them down cleanly
+# when the process exits.
+atexit.register(close_pool)
+
+
+_RECV_SIZE = 64 * 1024
+
+# How long wait_until_ready's TCP probe waits for the SSH port.
+_PROBE_TIMEOUT = 0.5
+
+def _port_open(host: str, port: int, timeout: float = _PROBE_TIMEOUT) -> bool:
+    """Return True if a TCP connection to host:port succeeds."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
 
 
 # ── RunResult ─────────────────────────────────────────────────────────
@@ -82,26 +215,32 @@ class SSHClient:
         self.port = port
         self.key_path = key_path if key_path is not None else get_ssh_key_path()
         self._client: paramiko.SSHClient | None = None
+        self._pool_key: _PoolKey = (host, user, port, str(self.key_path))
+        self._sftp: paramiko.SFTPClient | None = None
 
     # ── connection lifecycle ──────────────────────────────────────────
 
     def connect(self) -> None:
-        """Open an SSH connection to the host."""
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(
-            hostname=self.host,
-            port=self.port,
-            username=self.user,
-            key_filename=str(self.key_path),
-        )
-        self._client = client
+        """Open an SSH connection to the host.
+
+        Connections come from a process-wide pool keyed by
+        (host, user, port, key_path), so another SSHClient for the same
+        target reuses the already-authenticated transport.
+        """
+        self.close()
+        self._client = _acquire(self._pool_key)
 
     def close(self) -> None:
-        """Close the SSH connection if open."""
+        """Close the SFTP session and hand the connection back to the pool.
+
+        The underlying transport stays open for reuse; see close_pool().
+        """
+        if self._sftp is not None:
+            self._sftp.close()
+            self._sftp = None
         if self._client is not None:
-            self._client.close()
             self._client = None
+            _release(self._pool_key)
 
     def _ensure_connected(self) -> paramiko.SSHClient:
         """Return the underlying client, connecting first if needed."""
@@ -110,21 +249,59 @@ class SSHClient:
         assert self._client is not None
         return self._client
 
+    def _ensure_sftp(self) -> paramiko.SFTPClient:
+        """Return the SFTP session, opening it on first use.
+
+        The session is kept open so repeated transfers share one channel;
+        close() shuts it down.
+        """
+        if self._sftp is None:
+            self._sftp = self._ensure_connected().open_sftp()
+        return self._sftp
+
     # ── commands ──────────────────────────────────────────────────────
 
-    def run(self, command: str) -> RunResult:
+    def run(self, command: str, expect: str | None = None) -> RunResult:
         """Execute a command on the remote host.
 
-        Auto-connects if not already connected.
+        Auto-connects if not already connected.  Stdout is decoded
+        incrementally as it arrives.
+
+        Args:
+            command: Shell command to run.
+            expect: If given, stop reading as soon as this string appears
+                in stdout.  The channel is closed, stdout holds what was
+                read so far, and returncode is -1 unless the command had
+                already exited.
 
         Returns:
             RunResult with stdout, stderr, and return code.
         """
         client = self._ensure_connected()
         _stdin, stdout, stderr = client.exec_command(command)
-        rc = stdout.channel.recv_exit_status()
+        chan = stdout.channel
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks: list[str] = []
+        tail = ""
+
+        while data := chan.recv(_RECV_SIZE):
+            text = decoder.decode(data)
+            chunks.append(text)
+            if expect is not None:
+                # Only the seam between chunks can hide a new match.
+                window = tail + text
+                if expect in window:
+                    rc = chan.exit_status if chan.exit_status_ready() else -1
+                    chan.close()
+                    return RunResult(
+                        stdout="".join(chunks), stderr="", returncode=rc
+                    )
+                tail = window[-len(expect):]
+        chunks.append(decoder.decode(b"", final=True))
+
+        rc = chan.recv_exit_status()
         return RunResult(
-            stdout=stdout.read().decode(),
+            stdout="".join(chunks),
             stderr=stderr.read().decode(),
             returncode=rc,
         )
@@ -137,27 +314,20 @@ class SSHClient:
         Creates parent directories for local_path if they don't exist.
         """
         local_path.parent.mkdir(parents=True, exist_ok=True)
-        client = self._ensure_connected()
-        sftp = client.open_sftp()
-        try:
-            sftp.get(remote_path, str(local_path))
-        finally:
-            sftp.close()
+        self._ensure_sftp().get(remote_path, str(local_path))
 
     def upload(self, local_path: Path, remote_path: str) -> None:
         """Upload a local file to the remote host via SFTP."""
-        client = self._ensure_connected()
-        sftp = client.open_sftp()
-        try:
-            sftp.put(str(local_path), remote_path)
-        finally:
-            sftp.close()
+        self._ensure_sftp().put(str(local_path), remote_path)
 
     # ── readiness polling ─────────────────────────────────────────────
 
     def wait_until_ready(self, timeout: int = 300, interval: int = 2) -> None:
         """Poll connect() until the VM accepts SSH or timeout is reached.
 
+        Each attempt first probes the port with a plain TCP connect, so
+        the SSH handshake is only tried once something is listening.
+
         Args:
             timeout: Maximum seconds to wait.
             interval: Seconds between attempts.
@@ -169,6 +339,10 @@ class SSHClient:
         last_err: Exception | None = None
 
         while time.monotonic() < deadline:
+            if not _port_open(self.host, self.port):
+                last_err = ConnectionRefusedError(f"port {self.port} not open")
+                time.sleep(interval)
+                continue
             try:
                 self.connect()
                 return
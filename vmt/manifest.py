@@ -2,17 +2,137 @@
 
 from __future__ import annotations
 
+import copy
+import functools
+import hashlib
+import json
+import os
 import tomllib
 from pathlib import Path
 
+from vmt import __version__
 
-_VM_REQUIRED_SECTIONS = ("vm", "provision", "ssh")
-_VM_REQUIRED_FIELDS = ("name", "image")
-_VM_DEFAULTS = {"memory": 2048, "cpus": 2, "disk": 10}
 
-_TEST_REQUIRED_SECTIONS = ("test", "scenario")
+_VM_REQUIRED_SECTIONS = frozenset(("vm", "provision", "ssh"))
+_VM_REQUIRED_FIELDS = {"vm": frozenset(("name", "image"))}
+_VM_DEFAULTS = {
+    "vm": {"memory": 2048, "cpus": 2, "disk": 10},
+    "provision": {"env": {}},
+}
 
+_TEST_REQUIRED_SECTIONS = frozenset(("test", "scenario"))
 
+
+
+def _cache_home() -> Path:
+    """Return $XDG_CACHE_HOME, or ~/.cache when it is unset or relative."""
+    xdg = os.environ.get("XDG_CACHE_HOME", "")
+    return Path(xdg) if os.path.isabs(xdg) else Path.home() / ".cache"
+
+
+_CACHE_DIR = _cache_home() / "vmt" / "manifests"
+# Bump when the layout of cached entries changes.
+_CACHE_FORMAT = 1
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_toml(path: str, mtime_ns: int, size: int) -> dict:
+    """Parse a TOML file; memoized on (path, mtime_ns, size)."""
+    return tomllib.loads(Path(path).read_bytes().decode())
+
+
+def _read_toml(path: Path) -> dict:
+    """Return a private copy of the parsed TOML at *path*.
+
+    The parse is reused for as long as the file's mtime and size are
+    unchanged.  Callers get a deep copy so they may mutate it freely.
+    """
+    st = os.stat(path)
+    data = _parse_toml(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    return copy.deepcopy(data)
+
+
+def _cache_version() -> str:
+    """Token for the cache format, vmt version and validation schema."""
+    schema = json.dumps(
+        [
+            sorted(_VM_REQUIRED_SECTIONS),
+            {k: sorted(v) for k, v in _VM_REQUIRED_FIELDS.items()},
+            _VM_DEFAULTS,
+            sorted(_TEST_REQUIRED_SECTIONS),
+        ],
+        sort_keys=True,
+    )
+    return f"{_CACHE_FORMAT}:{__version__}:{schema}"
+
+
+def _disk_cached(loader):
+    """Cache *loader*'s validated result as JSON under _CACHE_DIR.
+
+    Entries are keyed by loader, absolute path, mtime and size, so an edited
+    manifest misses and is reloaded, and by _cache_version(), so entries
+    written by another vmt version or under other validation rules are
+    never served.  Each (loader, path) keeps a single entry: writing a new
+    one removes the stale ones.  Results JSON can't represent (TOML dates)
+    are never cached, and an unreadable or unwritable cache is ignored.
+    """
+
+    @functools.wraps(loader)
+    def wrapper(path: Path) -> dict:
+        st = os.stat(path)
+        source = f"{loader.__name__}:{os.path.abspath(path)}"
+        token = f"{_cache_version()}:{st.st_mtime_ns}:{st.st_size}"
+        prefix = hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+        digest = hashlib.blake2b(token.encode(), digest_size=8).hexdigest()
+        entry = _CACHE_DIR / f"{prefix}-{digest}.json"
+        try:
+            with open(entry) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        data = loader(path)
+        _write_cache_entry(entry, data)
+        return data
+
+    return wrapper
+
+
+def _write_cache_entry(entry: Path, data: dict) -> None:
+    """Atomically write *data* to *entry* and drop older entries for its path.
+
+    Entries that aren't JSON-safe are skipped.
+    """
+    try:
+        text = json.dumps(data)
+    except TypeError:
+        return
+    tmp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(text)
+        os.replace(tmp, entry)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return
+    prefix = entry.name.split("-", 1)[0]
+    for stale in entry.parent.glob(f"{prefix}-*.json"):
+        if stale != entry:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+def _require_sections(data: dict, required: frozenset[str]) -> None:
+    """Raise ValueError naming every section of *required* absent from *data*."""
+    missing = required - data.keys()
+    if missing:
+        names = ", ".join(f"[{section}]" for section in sorted(missing))
+        raise ValueError(f"Missing required section(s): {names}")
+
+
+@_disk_cached
 def load_vm_manifest(path: Path) -> dict:
     """Load and validate a VM manifest TOML file.
 
@@ -24,49 +144,62 @@ def load_vm_manifest(path: Path) -> dict:
     Raises:
         ValueError: If required sections or fields are missing.
     """
-    with open(path, "rb") as f:
-        data = tomllib.load(f)
+    data = _read_toml(path)
 
     # Validate required sections
-    for section in _VM_REQUIRED_SECTIONS:
-        if section not in data:
-            raise ValueError(f"Missing required section: [{section}]")
-
-    # Validate required vm fields
-    for field in _VM_REQUIRED_FIELDS:
-        if field not in data["vm"]:
-            raise ValueError(f"Missing required vm field: {field}")
+    _require_sections(data, _VM_REQUIRED_SECTIONS)
 
-    # Apply defaults for vm
-    for key, default in _VM_DEFAULTS.items():
-        data["vm"].setdefault(key, default)
+    # Validate required fields within sections
+    for section, fields in _VM_REQUIRED_FIELDS.items():
+        missing = fields - data[section].keys()
+        if missing:
+            names = ", ".join(sorted(missing))
+            raise ValueError(f"Missing required {section} field(s): {names}")
 
-    # Ensure provision.env exists
-    data["provision"].setdefault("env", {})
+    # Apply defaults (copied, so callers never share the mutable ones)
+    for section, defaults in _VM_DEFAULTS.items():
+        for key, default in defaults.items():
+            data[section].setdefault(key, copy.copy(default))
 
     return data
 
 
+@_disk_cached
 def load_test_manifest(path: Path) -> dict:
     """Load a test manifest TOML file.
 
     Required sections: [test], [[scenario]].
-    Supports [install], [install.<distro>], and scenario fields:
-    name, commands, screenshot, reference, threshold, expect_output.
+    Supports [install], [install.<distro>], ``parallel`` under [test],
+    and scenario fields: name, commands, screenshot, reference,
+    threshold, expect_output.
 
     Raises:
         ValueError: If required sections are missing.
     """
-    with open(path, "rb") as f:
-        data = tomllib.load(f)
+    data = _read_toml(path)
 
-    for section in _TEST_REQUIRED_SECTIONS:
-        if section not in data:
-            raise ValueError(f"Missing required section: [{section}]")
+    _require_sections(data, _TEST_REQUIRED_SECTIONS)
 
     return data
 
 
+def _dir_listing(d: Path) -> frozenset[str]:
+    """Names of the regular files in *d* (empty if unreadable)."""
+    try:
+        with os.scandir(d) as it:
+            return frozenset(entry.name for entry in it if entry.is_file())
+    except OSError:
+        return frozenset()
+
+
+def _locate_manifest(filename: str, search_dirs: tuple[Path, ...]) -> Path | None:
+    """Return the first <search_dir>/<filename> that is a file, or None."""
+    for d in search_dirs:
+        if filename in _dir_listing(d):
+            return d / filename
+    return None
+
+
 def find_manifest(name: str, search_dirs: list[Path]) -> Path:
     """Find <name>.toml across search directories.
 
@@ -76,10 +209,9 @@ def find_manifest(name: str, search_dirs: list[Path]) -> Path:
         FileNotFoundError: If the manifest is not found in any directory.
     """
     filename = f"{name}.toml"
-    for d in search_dirs:
-        candidate = d / filename
-        if candidate.is_file():
-            return candidate
-    raise FileNotFoundError(
-        f"Manifest '{filename}' not found in: {', '.join(str(d) for d in search_dirs) or '(no directories)'}"
-    )
+    found = _locate_manifest(filename, tuple(search_dirs))
+    if found is None:
+        raise FileNotFoundError(
+            f"Manifest '{filename}' not found in: {', '.join(str(d) for d in search_dirs) or '(no directories)'}"
+        )
+    return found
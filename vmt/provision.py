@@ -2,12 +2,85 @@
 
 from __future__ import annotations
 
-import subprocess
-import tempfile
+import io
+import json
+import re
 from pathlib import Path
 
+import pycdlib
 import yaml
 
+# Emit with libyaml's C dumper when PyYAML was built with it.
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+# The cloud-config has a fixed shape, so it is formatted directly rather
+# than built as a dict and run through yaml.dump.  Every hole is filled
+# with an already-quoted scalar (_yaml_quote) or sequence (_yaml_seq).
+#
+# bootcmd runs early, before services block on time-sync.  write_files
+# uses defer: true so entries are written during the final stage, after
+# the user has been created.
+_USER_DATA_TEMPLATE = """\
+#cloud-config
+bootcmd:{bootcmd}
+users:
+- name: {user}
+  ssh_authorized_keys:
+  - {ssh_pubkey}
+  sudo: "ALL=(ALL) NOPASSWD:ALL"
+  groups:
+  - video
+  - audio
+  shell: /bin/bash
+  lock_passwd: false
+  plain_text_passwd: vmt
+chpasswd:
+  expire: false
+ssh_pwauth: true
+package_update: true
+packages:{packages}
+write_files:
+- path: {service_path}
+  owner: {owner}
+  defer: true
+  content: {service_content}
+- path: /etc/systemd/system/getty@tty1.service.d/autologin.conf
+  content: {autologin_content}
+- path: {bash_profile_path}
+  owner: {owner}
+  defer: true
+  content: {bash_profile_content}
+- path: {bashrc_path}
+  owner: {owner}
+  defer: true
+  append: true
+  content: "export PATH=\\"$HOME/.local/bin:$PATH\\"\\n"
+runcmd:{runcmd}
+"""
+
+
+# Characters json.dumps leaves raw that YAML rejects or treats as line breaks.
+_YAML_UNSAFE = re.compile("[\x7f-\x9f\u2028\u2029\ufeff\ufffe\uffff]")
+
+
+def _yaml_quote(value: str) -> str:
+    """Return *value* as a double-quoted YAML scalar.
+
+    A JSON string is a valid YAML double-quoted scalar, and json.dumps
+    already escapes quotes, backslashes and C0 control characters.
+    """
+    return _YAML_UNSAFE.sub(
+        lambda m: f"\\u{ord(m[0]):04x}", json.dumps(value, ensure_ascii=False)
+    )
+
+
+def _yaml_seq(items: list[str]) -> str:
+    """Render *items* as a block sequence to follow ``key:`` on its line."""
+    if not items:
+        return " []"
+    return "".join(f"\n- {_yaml_quote(item)}" for item in items)
+
 
 def _is_arch_manifest(manifest: dict) -> bool:
     """Return True if the manifest targets Arch Linux."""
@@ -73,52 +146,21 @@ def generate_user_data(manifest: dict, ssh_pubkey: str) -> str:
     if _is_arch_manifest(manifest):
         bootcmd.append("pacman-key --init && pacman-key --populate archlinux")
 
-    cloud_config: dict = {
-        # bootcmd runs early, before services block on time-sync.
-        "bootcmd": bootcmd,
-        "users": [
-            {
-                "name": user,
-                "ssh_authorized_keys": [ssh_pubkey],
-                "sudo": "ALL=(ALL) NOPASSWD:ALL",
-                "groups": ["video", "audio"],
-                "shell": "/bin/bash",
-                "lock_passwd": False,
-                "plain_text_passwd": "vmt",
-            },
-        ],
-        "chpasswd": {"expire": False},
-        "ssh_pwauth": True,
-        "package_update": True,
-        "packages": list(packages),
-        # write_files uses defer: true so entries are written during the
-        # final stage, after the user has been created.
-        "write_files": [
-            {
-                "path": f"/home/{user}/.config/systemd/user/test-compositor.service",
-                "owner": f"{user}:{user}",
-                "defer": True,
-                "content": service_content,
-            },
-            {
-                "path": "/etc/systemd/system/getty@tty1.service.d/autologin.conf",
-                "content": autologin_content,
-            },
-            {
-                "path": f"/home/{user}/.bash_profile",
-                "owner": f"{user}:{user}",
-                "defer": True,
-                "content": bash_profile_content,
-            },
-            {
-                "path": f"/home/{user}/.bashrc",
-                "owner": f"{user}:{user}",
-                "defer": True,
-                "append": True,
-                "content": 'export PATH="$HOME/.local/bin:$PATH"\n',
-            },
-        ],
-        "runcmd": [
+    return _USER_DATA_TEMPLATE.format(
+        bootcmd=_yaml_seq(bootcmd),
+        user=_yaml_quote(user),
+        ssh_pubkey=_yaml_quote(ssh_pubkey),
+        packages=_yaml_seq(packages),
+        service_path=_yaml_quote(
+            f"/home/{user}/.config/systemd/user/test-compositor.service"
+        ),
+        bash_profile_path=_yaml_quote(f"/home/{user}/.bash_profile"),
+        bashrc_path=_yaml_quote(f"/home/{user}/.bashrc"),
+        owner=_yaml_quote(f"{user}:{user}"),
+        service_content=_yaml_quote(service_content),
+        autologin_content=_yaml_quote(autologin_content),
+        bash_profile_content=_yaml_quote(bash_profile_content),
+        runcmd=_yaml_seq([
             # Ensure sshd is running (some cloud images don't enable it)
             "systemctl enable --now sshd || systemctl enable --now ssh || true",
             f"loginctl enable-linger {user}",
@@ -127,11 +169,8 @@ def generate_user_data(manifest: dict, ssh_pubkey: str) -> str:
             f"machinectl shell {user}@ /bin/bash -c "
             f"'systemctl --user start pipewire wireplumber test-compositor' "
             "|| true",
-        ],
-    }
-
-    yaml_body = yaml.dump(cloud_config, default_flow_style=False, sort_keys=False)
-    return f"#cloud-config\n{yaml_body}"
+        ]),
+    )
 
 
 def generate_meta_data(vm_name: str) -> str:
@@ -143,38 +182,35 @@ def generate_meta_data(vm_name: str) -> str:
         "instance-id": f"vmt-{vm_name}",
         "local-hostname": vm_name,
     }
-    return yaml.dump(meta, default_flow_style=False, sort_keys=False)
+    return yaml.dump(
+        meta, Dumper=_Dumper, default_flow_style=False, sort_keys=False
+    )
 
 
 def create_cloud_init_iso(
     user_data: str, meta_data: str, output_path: Path
 ) -> None:
-    """Create a cloud-init NoCloud ISO using cloud-localds.
+    """Create a cloud-init NoCloud ISO.
 
-    Writes user-data and meta-data to temporary files, invokes
-    cloud-localds to build the ISO at output_path, then cleans up.
+    Builds the ISO in-process with pycdlib: volume label ``cidata`` with
+    user-data and meta-data at the root, named via Joliet and Rock Ridge
+    as cloud-localds does.
     """
-    ud_file = None
-    md_file = None
+    iso = pycdlib.PyCdlib()
+    iso.new(interchange_level=3, joliet=3, rock_ridge="1.09", vol_ident="cidata")
     try:
-        ud_file = tempfile.NamedTemporaryFile(
-            mode="w", suffix="-user-data", delete=False
-        )
-        ud_file.write(user_data)
-        ud_file.close()
-
-        md_file = tempfile.NamedTemporaryFile(
-            mode="w", suffix="-meta-data", delete=False
-        )
-        md_file.write(meta_data)
-        md_file.close()
-
-        subprocess.run(
-            ["cloud-localds", str(output_path), ud_file.name, md_file.name],
-            check=True,
-            capture_output=True,
-        )
+        for iso_name, name, text in (
+            ("/USERDATA.;1", "user-data", user_data),
+            ("/METADATA.;1", "meta-data", meta_data),
+        ):
+            data = text.encode()
+            iso.add_fp(
+                io.BytesIO(data),
+                len(data),
+                iso_name,
+                rr_name=name,
+                joliet_path=f"/{name}",
+            )
+        iso.write(str(output_path))
     finally:
-        for f in (ud_file, md_file):
-            if f is not None:
-                Path(f.name).unlink(missing_ok=True)
+        iso.close()
@@ -2,29 +2,69 @@
 
 from __future__ import annotations
 
+import functools
 import logging
+import os
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
-from skimage.io import imread, imsave
+from PIL import Image
+from skimage.measure import block_reduce
 from skimage.metrics import structural_similarity
-from skimage.transform import resize
 
 log = logging.getLogger(__name__)
 
+# SSIM is computed at roughly this many pixels on the short side, as in
+# Wang et al.'s reference ssim.m.
+_SSIM_SCALE = 256
 
-def _load_rgb(path: Path) -> np.ndarray:
-    """Load an image as uint8 RGB, stripping alpha if present."""
-    img = imread(str(path))
-    if img.ndim == 2:
-        # Grayscale → RGB
-        img = np.stack([img, img, img], axis=-1)
-    elif img.shape[2] == 4:
-        # RGBA → RGB (discard alpha)
-        img = img[:, :, :3]
+_DIFF_COLOR = np.array([255, 0, 0], dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=16)
+def _decode_rgb(path: str, mtime_ns: int, size: int) -> np.ndarray:
+    """Decode an image to read-only uint8 RGB; memoized on (path, mtime_ns, size)."""
+    with Image.open(path) as im:
+        img = np.asarray(im.convert("RGB"))
+    img.setflags(write=False)
     return img
 
 
+def _load_rgb(path: Path) -> np.ndarray:
+    """Load an image as uint8 RGB, stripping alpha if present.
+
+    Pillow's convert("RGB") expands grayscale and palette images and
+    drops the alpha channel in one pass.  Decodes are reused while the
+    file's mtime and size are unchanged, so the array is read-only.
+    """
+    st = os.stat(path)
+    return _decode_rgb(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def _resize_to(img: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Resize a uint8 RGB image to *shape* (H, W, ...) with PIL bilinear."""
+    resized = Image.fromarray(img).resize(
+        (shape[1], shape[0]), Image.Resampling.BILINEAR
+    )
+    return np.asarray(resized)
+
+
+def _downsample_for_ssim(img: np.ndarray) -> np.ndarray:
+    """Average-pool *img* by max(1, round(min(H, W) / 256)), as ssim.m does.
+
+    Trailing rows/columns that don't fill a whole block are cropped so
+    no zero padding leaks into the means.
+    """
+    factor = max(1, round(min(img.shape[:2]) / _SSIM_SCALE))
+    if factor == 1:
+        return img
+    h = img.shape[0] // factor * factor
+    w = img.shape[1] // factor * factor
+    return block_reduce(img[:h, :w], (factor, factor, 1), np.mean)
+
+
 def compare_screenshots(
     actual: Path,
     reference: Path,
@@ -44,6 +84,12 @@ def compare_screenshots(
     img_actual = _load_rgb(actual)
     img_ref = _load_rgb(reference)
 
+    # Pixel-identical screenshots (re-runs against their own reference)
+    # score 1.0 by definition; skip the SSIM convolutions.
+    if np.array_equal(img_actual, img_ref):
+        log.debug("Screenshots identical → SSIM 1.0")
+        return True, 1.0
+
     # Resize reference to match actual if dimensions differ.
     if img_actual.shape != img_ref.shape:
         log.info(
@@ -52,23 +98,63 @@ def compare_screenshots(
             img_actual.shape,
             actual,
         )
-        img_ref = resize(
-            img_ref,
-            img_actual.shape,
-            anti_aliasing=True,
-            preserve_range=True,
-        ).astype(np.uint8)
+        img_ref = _resize_to(img_ref, img_actual.shape)
 
+    # Downsample before SSIM: far fewer pixels to convolve, and closer to
+    # the scale the metric was designed for.
     score: float = structural_similarity(
-        img_actual,
-        img_ref,
+        _downsample_for_ssim(img_actual),
+        _downsample_for_ssim(img_ref),
         channel_axis=2,
+        data_range=255,
     )
     passed = bool(score >= threshold)
     log.debug("SSIM %.4f (threshold %.4f) → %s", score, threshold, passed)
     return passed, score
 
 
+def compare_screenshots_batch(
+    pairs: list[tuple[Path, Path]],
+    threshold: float | Sequence[float] = 0.95,
+) -> list[tuple[bool, float]]:
+    """Compare many (actual, reference) pairs concurrently.
+
+    Uses a thread pool: Pillow decoding and the SSIM convolutions release
+    the GIL, and the decoded images never need to cross a process
+    boundary.
+
+    Args:
+        pairs: (actual, reference) screenshot paths.
+        threshold: Minimum SSIM score to consider a pass, either one for
+            every pair or one per pair.
+
+    Returns:
+        One (passed, score) tuple per pair, in input order.
+
+    Raises:
+        ValueError: If per-pair thresholds don't match *pairs* in length.
+    """
+    if isinstance(threshold, (int, float)):
+        thresholds = [threshold] * len(pairs)
+    else:
+        thresholds = list(threshold)
+        if len(thresholds) != len(pairs):
+            raise ValueError(
+                f"Got {len(thresholds)} thresholds for {len(pairs)} pairs"
+            )
+    if not pairs:
+        return []
+    workers = min(len(pairs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(
+            ex.map(
+                lambda pair, t: compare_screenshots(*pair, threshold=t),
+                pairs,
+                thresholds,
+            )
+        )
+
+
 def generate_diff_image(
     actual: Path,
     reference: Path,
@@ -88,20 +174,17 @@ def generate_diff_image(
     img_ref = _load_rgb(reference)
 
     if img_actual.shape != img_ref.shape:
-        img_ref = resize(
-            img_ref,
-            img_actual.shape,
-            anti_aliasing=True,
-            preserve_range=True,
-        ).astype(np.uint8)
+        img_ref = _resize_to(img_ref, img_actual.shape)
 
-    diff = np.abs(img_actual.astype(np.int16) - img_ref.astype(np.int16))
+    # |a - b| without leaving uint8: max - min can't wrap around.
+    diff = np.maximum(img_actual, img_ref)
+    diff -= np.minimum(img_actual, img_ref)
     # Mark a pixel as different if *any* channel differs by more than 30.
-    mask = np.any(diff > 30, axis=-1)
+    mask = diff.max(axis=-1) > 30
 
-    result = img_actual.copy()
-    result[mask] = [255, 0, 0]
+    result = np.where(mask[..., None], _DIFF_COLOR, img_actual)
 
     output.parent.mkdir(parents=True, exist_ok=True)
-    imsave(str(output), result)
+    # The diff is a throwaway artifact: favour encode speed over size.
+    Image.fromarray(result).save(output, compress_level=1)
     log.info("Diff image written to %s (%d differing pixels)", output, mask.sum())
@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
+import atexit
+import fcntl
+import functools
+import hashlib
+import io
 import logging
 import os
+import pwd
 import shutil
+import struct
 import subprocess
+import threading
 import time
+import urllib.error
 import urllib.request
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from textwrap import dedent
+from xml.sax.saxutils import escape, quoteattr
 
 import libvirt
 
@@ -27,6 +37,152 @@ log = logging.getLogger(__name__)
 _IMAGES_DIR = Path.home() / ".cache" / "vmt" / "images"
 
 
+_DOWNLOAD_CHUNK = 1024 * 1024
+
+
+def _response_validator(resp) -> str | None:
+    """The response's strong ETag, else its Last-Modified, else None.
+
+    Weak ETags (``W/"..."``) can't be used with If-Range.
+    """
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _download_image(url: str, dest: Path, sha256: str | None = None) -> None:
+    """Stream *url* to *dest* via ``<dest>.partial``, resuming if possible.
+
+    The response's ETag or Last-Modified is saved next to the partial file
+    (``<dest>.partial.validator``).  An existing ``.partial`` is continued
+    with a Range request guarded by If-Range, so if the remote file has changed
+    (e.g. a ``latest`` URL was republished) the server sends the whole new
+    file and the download restarts from zero.  A partial file without a
+    saved validator can't be checked and is discarded.  The file is renamed
+    into place only once complete (and, when *sha256* is given, only if the
+    digest matches).
+
+    Raises:
+        ValueError: If the downloaded file doesn't match *sha256*.
+    """
+    partial = dest.with_name(dest.name + ".partial")
+    validator_file = dest.with_name(dest.name + ".partial.validator")
+    offset = partial.stat().st_size if partial.exists() else 0
+    validator = validator_file.read_text() if validator_file.exists() else None
+    if offset and not validator:
+        log.info("Discarding unverifiable partial download %s", partial)
+        offset = 0
+
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+        request.add_header("If-Range", validator)
+        log.info("Resuming download at %d bytes", offset)
+    try:
+        with urllib.request.urlopen(request) as resp:
+            if offset and resp.status != 206:
+                log.info("Remote image changed or Range ignored; restarting")
+                offset = 0
+            if not offset:
+                validator = _response_validator(resp)
+                if validator:
+                    validator_file.write_text(validator)
+                else:
+                    validator_file.unlink(missing_ok=True)
+            with open(partial, "ab" if offset else "wb") as f:
+                shutil.copyfileobj(resp, f, _DOWNLOAD_CHUNK)
+    except urllib.error.HTTPError as exc:
+        # 416 despite a matching If-Range: the partial file is already whole.
+        if not (offset and exc.code == 416):
+            raise
+
+    validator_file.unlink(missing_ok=True)
+    if sha256 is not None:
+        digest = hashlib.sha256()
+        with open(partial, "rb") as f:
+            while chunk := f.read(_DOWNLOAD_CHUNK):
+                digest.update(chunk)
+        if digest.hexdigest() != sha256.lower():
+            partial.unlink()
+            raise ValueError(
+                f"SHA256 mismatch for {url}: expected {sha256}, "
+                f"got {digest.hexdigest()}"
+            )
+
+    os.replace(partial, dest)
+
+
+# libvirt network the domain template attaches to.
+_NETWORK = "default"
+
+# How long one DHCPLeases() result is reused by _get_ip callers.
+_LEASE_TTL = 0.5
+
+# How often _wait_for_ip re-checks the leases.
+_IP_POLL_INTERVAL = 2.0
+
+
+_LIBVIRT_URI = "qemu:///system"
+
+# One connection shared by every VMManager in the process; it stays open
+# until exit (or until libvirtd drops it, in which case it is reopened).
+_conn_lock = threading.Lock()
+_shared_conn = None
+
+
+def _get_conn():
+    """Return the process-wide libvirt connection, opening it if needed."""
+    global _shared_conn
+    with _conn_lock:
+        if _shared_conn is not None and _shared_conn.isAlive():
+            return _shared_conn
+        conn = libvirt.open(_LIBVIRT_URI)
+        if conn is None:
+            raise RuntimeError(f"Failed to connect to {_LIBVIRT_URI}")
+        _shared_conn = conn
+        return conn
+
+
+def close_connection() -> None:
+    """Close the shared libvirt connection, if open."""
+    global _shared_conn
+    with _conn_lock:
+        if _shared_conn is not None:
+            try:
+                _shared_conn.close()
+            except libvirt.libvirtError:
+                pass
+            _shared_conn = None
+
+
+atexit.register(close_connection)
+
+
+# ioctl(2) request to share a file's extents (XFS, Btrfs, bcachefs, ...)
+_FICLONE = 0x40049409
+
+
+def _master_overlay(base: Path) -> Path:
+    """Path of the blank qcow2 overlay kept next to *base* for cloning."""
+    return base.with_name(base.name + ".overlay")
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Clone *src* to *dst* with FICLONE.
+
+    Returns False (leaving no *dst* behind) if the filesystem can't share
+    extents, so the caller can fall back to a real copy or ``qemu-img``.
+    """
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+    return True
+
+
 def _vm_dir(name: str) -> Path:
     """Per-VM working directory at ~/.cache/vmt/vms/{name}.
 
@@ -43,6 +199,35 @@ def _vm_dir(name: str) -> Path:
 
 _QEMU_USER = "libvirt-qemu"
 
+# Linux stores POSIX access ACLs in this xattr: a 4-byte version header
+# followed by (tag, perm, id) entries.  ACL_USER is the named-user tag.
+_ACL_XATTR = "system.posix_acl_access"
+_ACL_ENTRY = struct.Struct("<HHI")
+_ACL_USER = 0x02
+_ACL_PERM_BITS = {"r": 4, "w": 2, "x": 1}
+
+
+@functools.lru_cache(maxsize=1)
+def _qemu_uid() -> int | None:
+    """UID of the QEMU process user, or None if it doesn't exist here."""
+    try:
+        return pwd.getpwnam(_QEMU_USER).pw_uid
+    except KeyError:
+        return None
+
+
+def _has_user_acl(path: Path, uid: int, perm: str) -> bool:
+    """True if *path*'s access ACL already grants *uid* at least *perm*."""
+    try:
+        raw = os.getxattr(path, _ACL_XATTR)
+    except OSError:  # no ACL set, or the filesystem doesn't support them
+        return False
+    wanted = sum(_ACL_PERM_BITS[c] for c in perm)
+    for tag, bits, ident in _ACL_ENTRY.iter_unpack(raw[4:]):
+        if tag == _ACL_USER and ident == uid:
+            return bits & wanted == wanted
+    return False
+
 
 def _grant_qemu_access(path: Path) -> None:
     """Ensure the libvirt-qemu user can reach *path* through every ancestor.
@@ -57,14 +242,21 @@ def _grant_qemu_access(path: Path) -> None:
     a user's home directory (mode 700).
 
     Only directories that lack "other-execute" permission get an ACL entry,
-    so we don't touch directories that are already world-traversable.
+    so we don't touch directories that are already world-traversable, and
+    directories whose ACL already grants the QEMU user are skipped without
+    running ``setfacl``.
     """
     path = path.resolve()
+    uid = _qemu_uid()
 
     # Walk from root down to *path*, granting execute on each ancestor
     parts: list[Path] = list(reversed(list(path.parents)))  # [/, /home, ...]
     parts.append(path)  # include the target itself
 
+    # Group directories by the permission they need so each group is a
+    # single setfacl invocation: "x" for traversal on ancestors, "rx" on
+    # the target itself so QEMU can list files.
+    pending: dict[str, list[Path]] = {"x": [], "rx": []}
     for p in parts:
         if not p.is_dir():
             continue
@@ -72,20 +264,25 @@ def _grant_qemu_access(path: Path) -> None:
         # Check if "other" already has execute permission
         if st.st_mode & 0o001:
             continue
-        # Grant user ACL: execute only (for traversal) on ancestors,
-        # read+execute on the target itself so QEMU can list files
         perm = "rx" if p == path else "x"
+        if uid is not None and _has_user_acl(p, uid, perm):
+            continue
+        pending[perm].append(p)
+
+    for perm, dirs in pending.items():
+        if not dirs:
+            continue
         try:
             subprocess.run(
-                ["setfacl", "-m", f"u:{_QEMU_USER}:{perm}", str(p)],
+                ["setfacl", "-m", f"u:{_QEMU_USER}:{perm}", *map(str, dirs)],
                 check=True,
                 capture_output=True,
             )
-            log.debug("Granted %s ACL u:%s:%s on %s", perm, _QEMU_USER, perm, p)
+            log.debug("Granted ACL u:%s:%s on %s", _QEMU_USER, perm, dirs)
         except subprocess.CalledProcessError as exc:
             log.warning(
                 "setfacl failed on %s: %s (QEMU may not be able to access VM files)",
-                p,
+                ", ".join(map(str, dirs)),
                 exc.stderr.decode().strip(),
             )
 
@@ -95,6 +292,55 @@ def _grant_qemu_access(path: Path) -> None:
 # ---------------------------------------------------------------------------
 
 
+# Filled in with str.format_map; callers' values are XML-escaped first
+# (attribute values arrive already quoted by quoteattr).
+_DOMAIN_TEMPLATE = """\
+<domain type='kvm'>
+  <name>vmt-{name}</name>
+  <memory unit='KiB'>{memory_kib}</memory>
+  <vcpu>{cpus}</vcpu>
+  <os>
+    <type arch='x86_64' machine='q35'>hvm</type>
+    <boot dev='hd'/>
+  </os>
+  <features>
+    <acpi/>
+    <apic/>
+  </features>
+  <devices>
+    <disk type='file' device='disk'>
+      <driver name='qemu' type='qcow2'/>
+      <source file={disk_path}/>
+      <target dev='vda' bus='virtio'/>
+    </disk>
+    <disk type='file' device='cdrom'>
+      <driver name='qemu' type='raw'/>
+      <source file={cloud_init_iso}/>
+      <target dev='sda' bus='sata'/>
+      <readonly/>
+    </disk>
+    <interface type='network'>
+      <source network='default'/>
+      <model type='virtio'/>
+    </interface>
+    <graphics type='spice' autoport='yes' listen='127.0.0.1'/>
+    <video>
+      <model type='virtio'/>
+    </video>
+    <channel type='spicevmc'>
+      <target type='virtio' name='com.redhat.spice.0'/>
+    </channel>
+    <serial type='pty'>
+      <target port='0'/>
+    </serial>
+    <console type='pty'>
+      <target type='serial' port='0'/>
+    </console>
+  </devices>
+</domain>
+"""
+
+
 def generate_domain_xml(
     name: str,
     memory_mb: int,
@@ -106,52 +352,13 @@ def generate_domain_xml(
 
     Domain name is ``vmt-{name}``.  Uses KVM, q35 machine, boots from HD.
     """
-    memory_kib = memory_mb * 1024
-    return dedent(f"""\
-        <domain type='kvm'>
-          <name>vmt-{name}</name>
-          <memory unit='KiB'>{memory_kib}</memory>
-          <vcpu>{cpus}</vcpu>
-          <os>
-            <type arch='x86_64' machine='q35'>hvm</type>
-            <boot dev='hd'/>
-          </os>
-          <features>
-            <acpi/>
-            <apic/>
-          </features>
-          <devices>
-            <disk type='file' device='disk'>
-              <driver name='qemu' type='qcow2'/>
-              <source file='{disk_path}'/>
-              <target dev='vda' bus='virtio'/>
-            </disk>
-            <disk type='file' device='cdrom'>
-              <driver name='qemu' type='raw'/>
-              <source file='{cloud_init_iso}'/>
-              <target dev='sda' bus='sata'/>
-              <readonly/>
-            </disk>
-            <interface type='network'>
-              <source network='default'/>
-              <model type='virtio'/>
-            </interface>
-            <graphics type='spice' autoport='yes' listen='127.0.0.1'/>
-            <video>
-              <model type='virtio'/>
-            </video>
-            <channel type='spicevmc'>
-              <target type='virtio' name='com.redhat.spice.0'/>
-            </channel>
-            <serial type='pty'>
-              <target port='0'/>
-            </serial>
-            <console type='pty'>
-              <target type='serial' port='0'/>
-            </console>
-          </devices>
-        </domain>
-    """)
+    return _DOMAIN_TEMPLATE.format_map({
+        "name": escape(name),
+        "memory_kib": memory_mb * 1024,
+        "cpus": cpus,
+        "disk_path": quoteattr(disk_path),
+        "cloud_init_iso": quoteattr(cloud_init_iso),
+    })
 
 
 # ---------------------------------------------------------------------------
@@ -163,9 +370,12 @@ class VMManager:
     """Manages VM lifecycle via libvirt."""
 
     def __init__(self, manifest_dirs: list[Path] | None = None) -> None:
-        self._conn = libvirt.open("qemu:///system")
-        if self._conn is None:
-            raise RuntimeError("Failed to connect to qemu:///system")
+        self._conn = _get_conn()
+        self._mac_cache: dict[str, str | None] = {}
+        self._lease_lock = threading.Lock()
+        self._lease_cache: tuple[float, list[dict] | None] = (0.0, None)
+        # VM manifests by name, filled by up() and get_info()
+        self._manifest_cache: dict[str, dict] = {}
 
         if manifest_dirs is not None:
             self.manifest_dirs = manifest_dirs
@@ -175,10 +385,12 @@ class VMManager:
             self.manifest_dirs = [pkg_parent / "manifests"]
 
     def close(self) -> None:
-        """Close the libvirt connection."""
-        if self._conn is not None:
-            self._conn.close()
-            self._conn = None
+        """Release this manager's handle on the shared libvirt connection.
+
+        The connection itself stays open for other managers; see
+        :func:`close_connection`.
+        """
+        self._conn = None
 
     # ── public API ────────────────────────────────────────────────────
 
@@ -188,7 +400,7 @@ class VMManager:
         1. Find and load VM manifest
         2. Download cloud image (skip if cached)
         3. Create copy-on-write overlay disk
-        4. Generate cloud-init ISO
+        4. Generate cloud-init ISO (concurrently with steps 2-3)
         5. Grant QEMU user access to VM files via POSIX ACLs
         6. Define and start libvirt domain
         7. Wait for IP via DHCP leases
@@ -201,6 +413,7 @@ class VMManager:
         # 1. Load manifest
         manifest_path = find_manifest(name, self.manifest_dirs)
         manifest = load_vm_manifest(manifest_path)
+        self._manifest_cache[name] = manifest
         vm_cfg = manifest["vm"]
         ssh_cfg = manifest["ssh"]
 
@@ -212,32 +425,27 @@ class VMManager:
         ssh_user = ssh_cfg["user"]
         ssh_port = ssh_cfg.get("port", 22)
 
-        # 2. Download cloud image
-        _IMAGES_DIR.mkdir(parents=True, exist_ok=True)
-        image_filename = image_url.rsplit("/", 1)[-1] if "/" in image_url else image_url
-        base_image = _IMAGES_DIR / image_filename
-        if not base_image.exists():
-            log.info("Downloading cloud image: %s", image_url)
-            urllib.request.urlretrieve(image_url, str(base_image))
-        else:
-            log.info("Using cached image: %s", base_image)
-
-        # 3. Create overlay disk and resize to manifest spec
+        # 2-4. The image download and the cloud-init ISO are independent,
+        # so build the ISO while the image downloads; the overlay only
+        # needs the image.
         workdir = _vm_dir(vm_name)
-        overlay = workdir / "disk.qcow2"
-        self._create_overlay_disk(base_image, overlay)
-        subprocess.run(
-            ["qemu-img", "resize", str(overlay), f"{disk_gb}G"],
-            check=True,
-            capture_output=True,
-        )
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            image_future = pool.submit(
+                self._ensure_base_image, image_url, vm_cfg.get("image_sha256")
+            )
+            iso_future = pool.submit(self._create_seed_iso, manifest, workdir)
 
-        # 4. Generate cloud-init ISO
-        ssh_pubkey = get_ssh_pubkey()
-        user_data = generate_user_data(manifest, ssh_pubkey)
-        meta_data = generate_meta_data(vm_name)
-        ci_iso = workdir / "seed.iso"
-        create_cloud_init_iso(user_data, meta_data, ci_iso)
+            # 3. Create overlay disk and resize to manifest spec
+            base_image = image_future.result()
+            overlay = workdir / "disk.qcow2"
+            self._create_overlay_disk(base_image, overlay)
+            subprocess.run(
+                ["qemu-img", "resize", str(overlay), f"{disk_gb}G"],
+                check=True,
+                capture_output=True,
+            )
+
+            ci_iso = iso_future.result()
 
         # 5. Grant QEMU user access to VM files via ACLs
         _grant_qemu_access(_IMAGES_DIR)
@@ -315,8 +523,11 @@ class VMManager:
         ssh_user = "root"
         ssh_port = 22
         try:
-            manifest_path = find_manifest(name, self.manifest_dirs)
-            manifest = load_vm_manifest(manifest_path)
+            manifest = self._manifest_cache.get(name)
+            if manifest is None:
+                manifest_path = find_manifest(name, self.manifest_dirs)
+                manifest = load_vm_manifest(manifest_path)
+                self._manifest_cache[name] = manifest
             ssh_cfg = manifest.get("ssh", {})
             ssh_user = ssh_cfg.get("user", "root")
             ssh_port = ssh_cfg.get("port", 22)
@@ -474,7 +685,14 @@ class VMManager:
     # ── internal helpers ──────────────────────────────────────────────
 
     def _create_overlay_disk(self, base: Path, overlay: Path) -> None:
-        """Create a copy-on-write qcow2 overlay backed by base image."""
+        """Create a fresh copy-on-write qcow2 overlay backed by base image.
+
+        Any existing overlay is replaced, so every ``up()`` boots a clean disk.
+        """
+        master = _master_overlay(base)
+        if master.exists() and _reflink(master, overlay):
+            log.debug("Cloned overlay %s from %s", overlay, master)
+            return
         subprocess.run(
             [
                 "qemu-img", "create",
@@ -487,6 +705,31 @@ class VMManager:
             capture_output=True,
         )
 
+    def _ensure_base_image(self, image_url: str, sha256: str | None) -> Path:
+        """Return the cached cloud image for *image_url*, downloading if needed."""
+        _IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        image_filename = image_url.rsplit("/", 1)[-1] if "/" in image_url else image_url
+        base_image = _IMAGES_DIR / image_filename
+        if not base_image.exists():
+            log.info("Downloading cloud image: %s", image_url)
+            _download_image(image_url, base_image, sha256)
+        else:
+            log.info("Using cached image: %s", base_image)
+        # Blank overlay that per-VM overlays are reflinked from
+        master = _master_overlay(base_image)
+        if not master.exists():
+            self._create_overlay_disk(base_image, master)
+        return base_image
+
+    def _create_seed_iso(self, manifest: dict, workdir: Path) -> Path:
+        """Generate the cloud-init seed ISO for *manifest* in *workdir*."""
+        ssh_pubkey = get_ssh_pubkey()
+        user_data = generate_user_data(manifest, ssh_pubkey)
+        meta_data = generate_meta_data(manifest["vm"]["name"])
+        ci_iso = workdir / "seed.iso"
+        create_cloud_init_iso(user_data, meta_data, ci_iso)
+        return ci_iso
+
     def _wait_for_ip(self, dom, timeout: int = 60) -> str:
         """Poll DHCP leases until an IPv4 address appears."""
         deadline = time.monotonic() + timeout
@@ -494,13 +737,29 @@ class VMManager:
             ip = self._get_ip(dom)
             if ip is not None:
                 return ip
-            time.sleep(2)
+            time.sleep(_IP_POLL_INTERVAL)
         raise TimeoutError(
             f"No IP address for domain '{dom.name()}' after {timeout}s"
         )
 
     def _get_ip(self, dom) -> str | None:
-        """Get the first IPv4 address from DHCP leases, or None."""
+        """Get the domain's IPv4 address from DHCP leases, or None.
+
+        Leases are read for the whole network in one call and matched by
+        MAC, so concurrent waiters share a single lookup.  Falls back to
+        the per-domain lease query if the network can't be read.
+        """
+        mac = self._get_mac(dom)
+        leases = self._network_leases()
+        if mac is not None and leases is not None:
+            for lease in leases:
+                if (
+                    lease.get("mac", "").lower() == mac
+                    and lease.get("type") == libvirt.VIR_IP_ADDR_TYPE_IPV4
+                ):
+                    return lease["ipaddr"]
+            return None
+
         try:
             ifaces = dom.interfaceAddresses(
                 libvirt.VIR_DOMAIN_INTERFACE_ADDRESSES_SRC_LEASE
@@ -514,15 +773,53 @@ class VMManager:
                     return addr["addr"]
         return None
 
+    def _get_mac(self, dom) -> str | None:
+        """MAC of the domain's first network interface, cached by UUID.
+
+        libvirt assigns the MAC at define time, so a redefined domain with
+        the same name gets a new UUID and is looked up afresh.
+        """
+        try:
+            uuid = dom.UUIDString()
+        except libvirt.libvirtError:
+            return None
+        if uuid not in self._mac_cache:
+            mac = None
+            for _event, elem in ET.iterparse(
+                io.StringIO(dom.XMLDesc()), events=("start",)
+            ):
+                if elem.tag == "mac" and elem.get("address"):
+                    mac = elem.get("address").lower()
+                    break
+            self._mac_cache[uuid] = mac
+        return self._mac_cache[uuid]
+
+    def _network_leases(self) -> list[dict] | None:
+        """DHCP leases on the default network, cached for a short window."""
+        with self._lease_lock:
+            fetched_at, leases = self._lease_cache
+            if leases is not None and time.monotonic() - fetched_at < _LEASE_TTL:
+                return leases
+            try:
+                leases = self._conn.networkLookupByName(_NETWORK).DHCPLeases()
+            except libvirt.libvirtError:
+                return None
+            self._lease_cache = (time.monotonic(), leases)
+            return leases
+
     def _get_spice_port(self, dom) -> int | None:
-        """Parse domain XML to find the SPICE listen port."""
+        """Parse domain XML to find the SPICE listen port.
+
+        Stops at the first SPICE ``<graphics>`` element rather than building
+        the whole tree.
+        """
         xml_str = dom.XMLDesc()
-        root = ET.fromstring(xml_str)
-        graphics = root.find(".//graphics[@type='spice']")
-        if graphics is not None:
-            port = graphics.get("port")
-            if port and port != "-1":
-                return int(port)
+        for _event, elem in ET.iterparse(io.StringIO(xml_str), events=("start",)):
+            if elem.tag == "graphics" and elem.get("type") == "spice":
+                port = elem.get("port")
+                if port and port != "-1":
+                    return int(port)
+                return None
         return None
 
     def _cleanup_existing_domain(self, domain_name: str) -> None: